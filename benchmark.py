@@ -0,0 +1,255 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from panel_data import DATA_DIR, PANEL_KEYS, PANEL_SOURCES, add_model_variables, reshape_to_panel
+
+# --- Benchmarks on synthetic panels ---
+# Every stage of the cost pipeline is timed on generated panels of any size:
+# reading the three wide CSVs, reshape_to_panel, the merges, the PanelOLS fit
+# (and the fit_twfe engine for comparison) and the cost computation of
+# cost_estimation.py. The synthetic CSVs copy the layout of the real exports
+# (GbProv, ProvCH, ProvEN, then one 'YYYYQn' column per quarter), so the
+# stages run exactly the code the scripts use. Each stage is timed `repeat`
+# times and run once more under tracemalloc for its peak allocation.
+# Results are written as JSON to results/benchmarks/ and two runs can be
+# compared with --compare.
+
+BENCH_DIR = os.path.join(DATA_DIR, 'results', 'benchmarks')
+DEFAULT_SIZES = ((31, 12), (300, 12), (3000, 12), (3000, 40))
+TRUE_BETA = -0.0007
+
+
+def quarter_labels(n_periods, start_year=2020):
+    return [f"{start_year + t // 4}Q{t % 4 + 1}" for t in range(n_periods)]
+
+
+def synthetic_panel(directory, n_entities=31, n_periods=12, seed=0):
+    """Write GRP, stringency and cases CSVs shaped like the real exports.
+
+    log GRP = province effect + quarter effect + TRUE_BETA * stringency
+    - 80 * cases per person + noise, so the fitted model has a known answer.
+    Returns {source name: path}, suitable as the `paths` of panel_data.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    n, t = n_entities, n_periods
+    ids = pd.DataFrame({
+        'GbProv': 100_000 + np.arange(n),
+        'ProvCH': [f"地区{i}" for i in range(n)],
+        'ProvEN': [f"Region_{i:05d}" for i in range(n)],
+    })
+    stringency = np.clip(50 + 15 * rng.standard_normal((n, 1)) + 20 * rng.standard_normal((n, t)), 0, 100)
+    cases = rng.gamma(0.5, 20.0, size=(n, t))
+    log_grp = (rng.normal(6.0, 1.0, size=(n, 1)) + 0.02 * np.arange(t) + TRUE_BETA * stringency
+               - 80 * cases / 1e6 + 0.05 * rng.standard_normal((n, t)))
+    values = {'grp': np.exp(log_grp), 'stringency': stringency, 'cases': cases}
+
+    paths = {}
+    columns = quarter_labels(t)
+    for name in PANEL_SOURCES:
+        path = os.path.join(directory, f"synthetic_{name}_{n}x{t}.csv")
+        wide = pd.concat([ids, pd.DataFrame(values[name], columns=columns)], axis=1)
+        wide.to_csv(path, index=False, encoding='utf-8-sig')
+        paths[name] = path
+    return paths
+
+
+def _extra_regressors(df, k, seed):
+    # Noise controls so the fit has `k` regressors in total (at least the two
+    # of the baseline model).
+    rng = np.random.default_rng(seed)
+    names = [f"Control_{j}" for j in range(1, max(k - 2, 0) + 1)]
+    for name in names:
+        df[name] = rng.standard_normal(len(df))
+    return ['Stringency_Index', 'Covid_Cases'] + names
+
+
+# --- stages ---
+
+def stage_read(paths):
+    return {name: pd.read_csv(path) for name, path in paths.items()}
+
+
+def stage_reshape(wide):
+    frames = {}
+    for name, df_wide in wide.items():
+        df_long = reshape_to_panel(df_wide, PANEL_SOURCES[name][1])
+        df_long['Quarter'] = df_long['Quarter'].str.strip()
+        frames[name] = df_long
+    return frames
+
+
+def stage_merge(frames):
+    names = list(frames)
+    panel = frames[names[0]]
+    for name in names[1:]:
+        panel = pd.merge(panel, frames[name], on=PANEL_KEYS)
+    panel['Quarter'] = pd.Categorical(panel['Quarter'], categories=sorted(panel['Quarter'].unique()), ordered=True)
+    return panel
+
+
+def stage_fit_panelols(df, exog):
+    from linearmodels import PanelOLS
+    indexed = df.set_index(['GbProv', 'Time'])
+    model = PanelOLS(indexed['log_GRP'], indexed[exog], entity_effects=True, time_effects=True)
+    return model.fit(cov_type='clustered', cluster_entity=True)
+
+
+def stage_fit_twfe(df, exog):
+    from twfe_engine import fit_twfe
+    return fit_twfe(df, 'log_GRP', exog)
+
+
+def stage_cost(panel, results, draws, seed):
+    from policy_cost import cost_intervals
+    df = panel[['GbProv', 'ProvEN', 'Quarter', 'GRP_real', 'Stringency_Index']].rename(
+        columns={'GRP_real': 'GRP_real_actual'})
+    beta = results.params['Stringency_Index']
+    counterfactual = df['GRP_real_actual'] / np.exp(beta * df['Stringency_Index'])
+    total = (counterfactual - df['GRP_real_actual']).sum()
+    intervals = cost_intervals(df, results.params, results.cov, ['Stringency_Index'], draws=draws, seed=seed)
+    return total, intervals
+
+
+def measure(fn, *args, repeat=3):
+    """Run fn(*args) once to warm up, `repeat` times for timings, then once under tracemalloc.
+
+    The warm-up keeps lazy imports (linearmodels) and first-call overhead out
+    of the timings.
+    """
+    fn(*args)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(*args)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, {
+        'seconds_min': min(times),
+        'seconds_median': float(np.median(times)),
+        'peak_mb': peak / 2 ** 20,
+    }
+
+
+def run_benchmark(n_entities, n_periods, k=2, repeat=3, draws=1000, seed=0, directory=None):
+    """Time every stage on one synthetic panel; returns a JSON-ready dict."""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = synthetic_panel(directory or tmp, n_entities, n_periods, seed)
+        stages = {}
+        wide, stages['csv_read'] = measure(stage_read, paths, repeat=repeat)
+        frames, stages['reshape'] = measure(stage_reshape, wide, repeat=repeat)
+        panel, stages['merge'] = measure(stage_merge, frames, repeat=repeat)
+
+        df = add_model_variables(panel)
+        exog = _extra_regressors(df, k, seed)
+        _, stages['fit_panelols'] = measure(stage_fit_panelols, df, exog, repeat=repeat)
+        results, stages['fit_twfe'] = measure(stage_fit_twfe, df, exog, repeat=repeat)
+        _, stages['cost'] = measure(stage_cost, panel, results, draws, seed, repeat=repeat)
+
+    return {
+        'n_entities': n_entities,
+        'n_periods': n_periods,
+        'k': len(exog),
+        'nobs': int(results.nobs),
+        'draws': draws,
+        'stages': stages,
+        'beta_stringency': float(results.params['Stringency_Index']),
+    }
+
+
+def environment():
+    versions = {'python': platform.python_version()}
+    for name in ('numpy', 'pandas', 'scipy', 'linearmodels'):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=DATA_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'platform': platform.platform(), 'cpus': os.cpu_count(), 'versions': versions}
+
+
+def compare(old_file, new_file):
+    """Per-stage ratio of median times (new / old) for the sizes both files share."""
+    with open(old_file) as f:
+        old = json.load(f)
+    with open(new_file) as f:
+        new = json.load(f)
+    def key(run):
+        return run['n_entities'], run['n_periods'], run['k']
+
+    old_runs = {key(run): run for run in old['runs']}
+    rows = []
+    for run in new['runs']:
+        before = old_runs.get(key(run))
+        if before is None:
+            continue
+        for stage, stats in run['stages'].items():
+            if stage in before['stages']:
+                rows.append({
+                    'N': run['n_entities'], 'T': run['n_periods'], 'K': run['k'], 'stage': stage,
+                    'old_s': before['stages'][stage]['seconds_median'],
+                    'new_s': stats['seconds_median'],
+                    'ratio': stats['seconds_median'] / before['stages'][stage]['seconds_median'],
+                })
+    return pd.DataFrame(rows)
+
+
+def parse_size(text):
+    n, t = text.lower().split('x')
+    return int(n), int(t)
+
+
+def main(argv=None):
+    """Run the benchmark CLI; returns the path of the written results file."""
+    parser = argparse.ArgumentParser(description="Benchmark the load/reshape/merge/fit/cost pipeline on synthetic panels.")
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=list(DEFAULT_SIZES),
+                        help="panel sizes as NxT, e.g. 31x12 3000x40")
+    parser.add_argument('-k', type=int, default=2, help="number of regressors in the fit (>= 2)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--draws', type=int, default=1000, help="coefficient draws in the cost stage")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="JSON file to write (default: results/benchmarks/bench-<timestamp>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two benchmark files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with pd.option_context('display.float_format', '{:,.4f}'.format, 'display.width', 160):
+            print(compare(*args.compare).to_string(index=False))
+        return None
+
+    runs = []
+    for n, t in args.sizes:
+        run = run_benchmark(n, t, k=args.k, repeat=args.repeat, draws=args.draws, seed=args.seed)
+        runs.append(run)
+        print(f"N={n:>6} T={t:>3} K={run['k']}: "
+              + "  ".join(f"{stage} {stats['seconds_median']:.3f}s/{stats['peak_mb']:.0f}MB"
+                          for stage, stats in run['stages'].items()))
+
+    stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    output = args.output or os.path.join(BENCH_DIR, f"bench-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'created': stamp, 'environment': environment(), 'runs': runs}, f, indent=2)
+    print(f"Benchmark results written to {output}")
+    return output
+
+
+if __name__ == '__main__':
+    main()
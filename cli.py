@@ -0,0 +1,191 @@
+import argparse
+import importlib
+import math
+import sys
+
+# --- Command-line entry point ---
+#     python cli.py list-specs
+#     python cli.py show-cached [spec]
+#     python cli.py fit <spec> [--refit] [--cov TYPE] [--panelols]
+#     python cli.py cost [--spec SPEC] [--draws N]
+#     python cli.py scenarios [--spec SPEC]
+#     python cli.py plot [--report] [grp_viz.py options]
+#     python cli.py bench [benchmark.py options]
+# Every subcommand imports what it needs inside its handler: listing specs or
+# stored results touches only specs.py and the JSON files of the result store,
+# the native engine brings in numpy/pandas/scipy, and linearmodels, matplotlib
+# and seaborn are loaded only by --panelols, plot and bench. The model scripts
+# (twfe.py, cost_estimation.py, ...) expose main() and their steps as
+# functions, so batch drivers can call them directly instead of as
+# subprocesses.
+
+# Specs whose original linearmodels script can be run with `fit --panelols`
+# (each script is named after its spec). twfe_urbanisation_interaction.py is
+# left out: its model cannot be estimated (see specs.py).
+PANELOLS_SCRIPTS = ('twfe', 'lagged_twfe', 'twfe_urbanisation_interactionONLY',
+                    'twfe_urbanisation_interactionONLY_lagged')
+
+
+def cmd_list_specs(args):
+    from specs import SPECS, get_spec
+
+    for name in SPECS:
+        spec = get_spec(name)
+        extras = [f"lags={spec['lags']}"] if spec['lags'] else []
+        if spec['moderator']:
+            extras.append(f"moderator={spec['moderator']}")
+        if spec['slopes']:
+            extras.append(f"slopes={','.join(spec['slopes'])}")
+        print(f"{name:<42} {spec['dependent']} ~ {' + '.join(spec['exog'])}"
+              + (f"  [{'; '.join(extras)}]" if extras else ""))
+    return 0
+
+
+def cmd_show_cached(args):
+    import json
+    import os
+
+    from result_store import STORE_DIR, list_results
+
+    entries = list_results()
+    if args.spec is None:
+        if not entries:
+            print(f"No stored results in {STORE_DIR}")
+        for entry in entries:
+            print(f"{entry['key'][:12]}  {entry['created']}  {entry['name']:<42} nobs={entry['nobs']}")
+        return 0
+
+    matches = sorted((e for e in entries if e['name'] == args.spec), key=lambda e: e['created'])
+    if not matches:
+        print(f"No stored result for '{args.spec}'; run `python cli.py fit {args.spec}` first.")
+        return 1
+    with open(os.path.join(STORE_DIR, f"{matches[-1]['key'][:24]}.json")) as f:
+        record = json.load(f)
+    print(f"{args.spec}  (stored {record['created']}, data {record['data_hash'][:12]}, "
+          f"nobs {record['nobs']}, {record['cov_type']} SE)")
+    for i, name in enumerate(record['exog']):
+        param, se = record['params'][i], math.sqrt(record['cov'][i][i])
+        print(f"  {name:<40} {param:>14.6g} {se:>14.6g} {param / se:>9.3f}")
+    return 0
+
+
+def cmd_fit(args):
+    if args.panelols:
+        if args.spec not in PANELOLS_SCRIPTS:
+            print(f"No PanelOLS script for '{args.spec}'.")
+            return 1
+        return 0 if importlib.import_module(args.spec).main() is not None else 1
+
+    from result_store import fit_spec
+    from specs import get_spec
+
+    try:
+        spec = get_spec(args.spec)
+        if spec['slopes'] and args.cov is not None:
+            # fit_twfe_slopes computes its covariance during the fit, so the
+            # estimator goes into the spec instead of onto the result.
+            from sparse_twfe import SLOPE_COV_TYPES
+            if args.cov not in SLOPE_COV_TYPES:
+                raise ValueError(f"Spec '{args.spec}' has entity slopes; --cov supports only "
+                                 f"{', '.join(SLOPE_COV_TYPES)} for it.")
+            results = fit_spec(dict(spec, cov_type=args.cov), refit=args.refit)
+        else:
+            # Stored results carry no per-observation scores, so another
+            # covariance estimator needs a refit.
+            results = fit_spec(args.spec, refit=args.refit or args.cov is not None)
+            if args.cov is not None:
+                results = results.with_covariance(args.cov, bandwidth=args.bandwidth)
+    except (KeyError, ValueError, FileNotFoundError) as e:
+        print(f"Error: {e.args[0] if e.args else e}")
+        return 1
+    print(results.summary())
+    return 0
+
+
+def cmd_cost(args):
+    import cost_estimation
+    options = {key: getattr(args, key) for key in ('spec', 'draws', 'seed') if getattr(args, key) is not None}
+    try:
+        intervals = cost_estimation.main(**options)
+    except (KeyError, ValueError) as e:
+        print(f"Error: {e.args[0] if e.args else e}")
+        return 1
+    return 0 if intervals is not None else 1
+
+
+def cmd_scenarios(args):
+    import scenarios
+    try:
+        scenarios.main(args.options)
+    except (KeyError, ValueError) as e:
+        print(f"Error: {e.args[0] if e.args else e}")
+        return 1
+    return 0
+
+
+def cmd_plot(args):
+    import grp_viz
+    try:
+        grp_viz.main(args.options)
+    except (KeyError, ValueError) as e:
+        print(f"Error: {e.args[0] if e.args else e}")
+        return 1
+    return 0
+
+
+def cmd_bench(args):
+    import benchmark
+    benchmark.main(args.options)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="China COVID policy cost TWFE pipeline.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sub = commands.add_parser('list-specs', help="list the model specs of specs.py")
+    sub.set_defaults(handler=cmd_list_specs)
+
+    sub = commands.add_parser('show-cached', help="list stored results, or print one spec's stored estimates")
+    sub.add_argument('spec', nargs='?')
+    sub.set_defaults(handler=cmd_show_cached)
+
+    sub = commands.add_parser('fit', help="fit a spec (from the result store when unchanged)")
+    sub.add_argument('spec')
+    sub.add_argument('--refit', action='store_true', help="ignore the stored result")
+    sub.add_argument('--cov', help="covariance estimator, e.g. two-way or driscoll-kraay (see twfe_engine.COV_TYPES)")
+    sub.add_argument('--bandwidth', type=int, help="Driscoll-Kraay lag truncation")
+    sub.add_argument('--panelols', action='store_true', help="run the spec's original linearmodels script instead")
+    sub.set_defaults(handler=cmd_fit)
+
+    sub = commands.add_parser('cost', help="policy cost of zero-COVID stringency (cost_estimation.py)")
+    sub.add_argument('--spec', help="model spec (default: cost_estimation.COST_SPEC)")
+    sub.add_argument('--draws', type=int, help="coefficient draws (default: cost_estimation.N_DRAWS)")
+    sub.add_argument('--seed', type=int)
+    sub.set_defaults(handler=cmd_cost)
+
+    sub = commands.add_parser('scenarios', help="counterfactual stringency scenarios (options of scenarios.py)",
+                              add_help=False)
+    sub.set_defaults(handler=cmd_scenarios, passthrough=True)
+
+    sub = commands.add_parser('plot', help="GRP plot or headless report figures (options of grp_viz.py)",
+                              add_help=False)
+    sub.set_defaults(handler=cmd_plot, passthrough=True)
+
+    sub = commands.add_parser('bench', help="pipeline benchmark (options of benchmark.py)", add_help=False)
+    sub.set_defaults(handler=cmd_bench, passthrough=True)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    # scenarios, plot and bench hand their options on to the module's own parser.
+    args, options = parser.parse_known_args(argv)
+    if options and not getattr(args, 'passthrough', False):
+        parser.error(f"unrecognized arguments: {' '.join(options)}")
+    args.options = options
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,56 +1,137 @@
-import pandas as pd
 import numpy as np
+import pandas as pd
+
+from instrumentation import stage, start_run
+from lags import add_lags, interaction_name, lag_name, moderator_list
+from panel_data import add_moderators, load_panel
+from policy_cost import cost_intervals, policy_cost
+from result_store import fit_spec
+from specs import get_spec
+
+# Model (see specs.py) whose coefficients drive the counterfactual. Every
+# stringency term of the spec (level, lags, moderator interactions, province
+# slopes) is switched off in the no-policy counterfactual.
+COST_SPEC = 'twfe'
+N_DRAWS = 10_000
+SEED = 20200123
+
+
+def add_policy_terms(df_analysis, spec, params):
+    """Copy of the cost panel with the stringency terms of `spec` as columns, and their names.
+
+    Lags before the first quarter are 0, as in scenarios.ScenarioEngine:
+    quarters before the panel contribute no policy effect. Only terms with a
+    fitted coefficient in `params` are returned.
+    """
+    from sparse_twfe import slope_name
+
+    full = get_spec(spec)
+    df = df_analysis.copy()
+    df['Time'] = df['Quarter'].cat.remove_unused_categories().cat.codes
+    moderators = moderator_list(full['moderator'])
+    interact = [var for var in full['interact'] if var == 'Stringency_Index']
+    if moderators:
+        df = add_moderators(df, moderators)
+    if full['lags'] or moderators:
+        df = add_lags(df, ['Stringency_Index'], lags=full['lags'], edge='zero', moderator=full['moderator'],
+                      interact=interact)
+
+    shifts = range(full['lags'] + 1)
+    terms = [lag_name('Stringency_Index', k) for k in shifts]
+    terms += [interaction_name(var, k, mod) for mod in moderators for var in interact for k in shifts]
+    gbprov = df['GbProv'].astype(np.int64)
+    for term in [t for t in terms if t in full['slopes']]:
+        slopes = {slope_name(term, g): np.where(gbprov == g, df[term], 0.0) for g in np.sort(gbprov.unique())}
+        df = df.assign(**slopes)
+        terms += list(slopes)
+    terms = [t for t in terms if t in params.index]
+    if not terms:
+        raise ValueError(f"Spec '{spec}' has no stringency terms to price.")
+    return df, terms
+
+
+def estimate_cost(df_analysis, spec=COST_SPEC, draws=N_DRAWS, seed=SEED):
+    """Counterfactual GRP and policy cost per province-quarter, with intervals.
+
+    `df_analysis` is the GRP and stringency panel of step 1. Returns the panel
+    with GRP_counterfactual, Policy_Cost and the policy term columns added,
+    the cost_intervals table, the fitted results of `spec` and the names of
+    the priced terms.
+    """
+    df_analysis = df_analysis.rename(columns={'GRP_real': 'GRP_real_actual'})
+
+    # --- 2. Estimate the Core Parameter from our Regression ---
+    # The stringency coefficients and their clustered covariance come from the
+    # spec's TWFE model (for 'twfe' the baseline of twfe.py: log(GRP) on
+    # Stringency_Index and Covid_Cases with province and quarter effects,
+    # clustered by province). The fit is read from the result store and only
+    # re-estimated when the spec or data change.
+    with stage('fit', spec=spec) as info:
+        results = fit_spec(spec)
+        info['rows'] = results.nobs
+    df_analysis, terms = add_policy_terms(df_analysis, spec, results.params)
+
+    # --- 3. Calculate Counterfactual GRP and Policy Cost ---
+    with stage('cost', draws=draws) as info:
+        # The cost is the difference between the 'no-policy' scenario and what
+        # actually happened, for each province-quarter observation
+        df_analysis['Policy_Cost'] = policy_cost(df_analysis['GRP_real_actual'], df_analysis[terms],
+                                                 results.params[terms])
+        df_analysis['GRP_counterfactual'] = df_analysis['GRP_real_actual'] + df_analysis['Policy_Cost']
+
+        # Propagate the coefficient uncertainty: delta method plus `draws` simulated
+        # coefficient vectors, for the total and per province / per quarter.
+        intervals = cost_intervals(df_analysis, results.params, results.cov, terms, draws=draws, seed=seed)
+        info['rows'] = len(df_analysis)
+    return df_analysis, intervals, results, terms
+
+
+# --- 4. Aggregate and Present the Final Result ---
+def print_summary(df_analysis, intervals, results, terms, spec=COST_SPEC, draws=N_DRAWS):
+    # Sum the costs across all observations
+    total_cost_billion_rmb = df_analysis['Policy_Cost'].sum()
+    total = intervals.loc[('Total', 'All')]
+
+    # Convert to a more readable format (Trillion RMB)
+    total_cost_trillion_rmb = total_cost_billion_rmb / 1000
+
+    # --- Print a clear, publication-ready summary ---
+    print("==============================================================================")
+    print("   Estimated Total Economic Cost of Zero-COVID Policies (2020-2022)")
+    print("==============================================================================")
+    if terms == ['Stringency_Index']:
+        print(f"Based on the estimated coefficient (β1) of: {results.params['Stringency_Index']:.6f} (clustered s.e. {results.std_errors['Stringency_Index']:.6f})")
+    else:
+        print(f"Based on the {len(terms)} estimated stringency terms of the '{spec}' model")
+    print(f"Total calculated policy-attributable GRP loss (Billion 2019 RMB): {total_cost_billion_rmb:,.2f}")
+    print(f"Total calculated policy-attributable GRP loss (Trillion 2019 RMB): {total_cost_trillion_rmb:,.2f}")
+    print(f"  95% CI, delta method (Billion 2019 RMB):              [{total['delta_lower']:,.2f}, {total['delta_upper']:,.2f}]")
+    print(f"  95% CI, {draws:,} coefficient draws (Billion 2019 RMB): [{total['sim_lower']:,.2f}, {total['sim_upper']:,.2f}]")
+    print("==============================================================================")
+    with pd.option_context('display.float_format', '{:,.2f}'.format, 'display.width', 160, 'display.max_columns', None):
+        print("\nPolicy cost by province (Billion 2019 RMB):")
+        print(intervals.loc['ProvEN'].sort_values('cost', ascending=False))
+        print("\nPolicy cost by quarter (Billion 2019 RMB):")
+        print(intervals.loc['Quarter'])
+
+
+def main(spec=COST_SPEC, draws=N_DRAWS, seed=SEED):
+    """Estimate and print the policy cost; returns the cost_intervals table (None if data is missing)."""
+    run = start_run('cost_estimation')
+
+    # --- 1. Load Necessary Data ---
+    # The actual observed Real GRP with the Stringency Index for each
+    # province-quarter, merged into a long panel cached by panel_data.load_panel.
+    try:
+        df_analysis = load_panel(sources=('grp', 'stringency'))
+        df_analysis, intervals, results, terms = estimate_cost(df_analysis, spec=spec, draws=draws, seed=seed)
+    except FileNotFoundError:
+        print("Error: Ensure data files are in the same directory.")
+        return None
+    print_summary(df_analysis, intervals, results, terms, spec=spec, draws=draws)
+    run.write()
+    return intervals
+
 
-# --- 1. Define the Core Parameter from our Regression ---
-# This is the statistically significant coefficient from Model 2.
-BETA_1_STRINGENCY = -0.00075
-
-# --- 2. Load Necessary Data ---
-try:
-    # We need the actual observed Real GRP data
-    df_grp_real = pd.read_csv("China_COVID_measures_cost.xlsx - GRB (Real 2019 Billion RMB).csv")
-    # We need the Stringency Index data for each province-quarter
-    df_stringency = pd.read_csv("China_COVID_measures_cost.xlsx - OxCGRT Stringency Index.csv")
-except FileNotFoundError:
-    print("Error: Ensure data files are in the same directory.")
-    exit()
-
-# --- 3. Reshape Data to Long (Panel) Format ---
-def reshape_to_panel(df, value_name):
-    quarter_cols = [col for col in df.columns if 'Q' in col and col.startswith('20')]
-    df_long = df.melt(
-        id_vars=['GbProv', 'ProvEN'],
-        value_vars=quarter_cols,
-        var_name='Quarter',
-        value_name=value_name
-    )
-    return df_long
-
-panel_grp = reshape_to_panel(df_grp_real, 'GRP_real_actual')
-panel_stringency = reshape_to_panel(df_stringency, 'Stringency_Index')
-
-# --- 4. Merge into a Single DataFrame ---
-df_analysis = pd.merge(panel_grp, panel_stringency, on=['GbProv', 'ProvEN', 'Quarter'])
-
-# --- 5. Calculate Counterfactual GRP and Policy Cost ---
-# Apply the formula to each row (each province-quarter observation)
-df_analysis['GRP_counterfactual'] = df_analysis['GRP_real_actual'] / np.exp(BETA_1_STRINGENCY * df_analysis['Stringency_Index'])
-
-# The cost is the difference between the 'no-policy' scenario and what actually happened
-df_analysis['Policy_Cost'] = df_analysis['GRP_counterfactual'] - df_analysis['GRP_real_actual']
-
-# --- 6. Aggregate and Present the Final Result ---
-# Sum the costs across all observations
-total_cost_billion_rmb = df_analysis['Policy_Cost'].sum()
-
-# Convert to a more readable format (Trillion RMB)
-total_cost_trillion_rmb = total_cost_billion_rmb / 1000
-
-# --- Print a clear, publication-ready summary ---
-print("==============================================================================")
-print("   Estimated Total Economic Cost of Zero-COVID Policies (2020-2022)")
-print("==============================================================================")
-print(f"Based on the estimated coefficient (β1) of: {BETA_1_STRINGENCY}")
-print(f"Total calculated policy-attributable GRP loss (Billion 2019 RMB): {total_cost_billion_rmb:,.2f}")
-print(f"Total calculated policy-attributable GRP loss (Trillion 2019 RMB): {total_cost_trillion_rmb:,.2f}")
-print("==============================================================================")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
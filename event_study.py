@@ -0,0 +1,273 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from panel_array import PanelArray
+from panel_data import DATA_DIR
+
+# --- Staggered-adoption event study (Callaway-Sant'Anna) ---
+# TWFE on the continuous stringency index averages effects with weights that
+# can turn negative when provinces adopt at different times and effects vary.
+# Here adoption is binary: a province joins cohort g in the first quarter in
+# which its stringency reaches `threshold` (for `persist` consecutive
+# quarters) and is treated from then on. For every cohort g and quarter t the
+# group-time effect is a difference in differences of outcome changes,
+#     ATT(g, t) = mean_{G=g}(Y_t - Y_b) - mean_{controls}(Y_t - Y_b),
+# with b = g - 1 for t >= g ('varying' base: b = t - 1 before adoption;
+# 'universal': always g - 1) and controls either never-treated provinces or
+# those not yet treated by max(t, b). Provinces already above the threshold
+# in the first quarter have no pre-period and are left out.
+#
+# All cells are computed at once: outcome changes for every (unit, cohort,
+# quarter) are one (N, G, T) array, and the treated and control masks select
+# from it, so each ATT(g, t) is a pair of masked means rather than a
+# regression. Per-unit influence functions come from the same arrays and
+# give multiplier-bootstrap standard errors and uniform confidence bands,
+# also for the aggregation to event time e = t - g (cohort-size weighted,
+# including the estimated weights' own influence).
+
+OUTPUT_DIR = os.path.join(DATA_DIR, 'results', 'event_study')
+
+
+def adoption_cohorts(treatment, threshold, persist=1):
+    """Cohort (first period index at or above `threshold`) of each row of an (N, T) array.
+
+    A crossing counts only if the next `persist` - 1 periods stay at or above
+    the threshold. Rows that never cross get T.
+    """
+    above = np.nan_to_num(np.asarray(treatment, dtype=np.float64), nan=-np.inf) >= threshold
+    n_periods = above.shape[1]
+    held = above.copy()
+    for k in range(1, persist):
+        held[:, :-k] &= above[:, k:]
+        held[:, n_periods - k:] = False
+    return np.where(held.any(axis=1), held.argmax(axis=1), n_periods)
+
+
+def group_time_effects(y, cohorts, control='notyet', base='varying'):
+    """ATT(g, t) for every adoption cohort and period of an (N, T) outcome array.
+
+    Returns (groups, att, influence, valid, n_treated, n_control): `att` and
+    the cell counts are (G, T), `influence` the (N, G, T) per-unit influence
+    functions (zero outside valid cells) and `valid` marks identified cells.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n, n_periods = y.shape
+    groups = np.unique(cohorts[(cohorts > 0) & (cohorts < n_periods)])
+    g = groups[:, None]
+    t = np.arange(n_periods)[None, :]
+    if base == 'varying':
+        b = np.where(t >= g, g - 1, t - 1)
+    elif base == 'universal':
+        b = np.broadcast_to(g - 1, (len(groups), n_periods))
+    else:
+        raise ValueError(f"Unknown base '{base}'; use 'varying' or 'universal'.")
+    cells = (b >= 0) & (t != b)
+
+    diff = y[:, None, :] - y[:, np.clip(b, 0, None)]
+    observed = ~np.isnan(diff) & cells[None]
+    diff = np.where(observed, diff, 0.0)
+    unit_cohort = cohorts[:, None, None]
+    treated = observed & (unit_cohort == groups[None, :, None])
+    if control == 'never':
+        controls = observed & (unit_cohort == n_periods)
+    elif control == 'notyet':
+        controls = observed & (unit_cohort > np.maximum(t, b)[None]) & (unit_cohort != groups[None, :, None])
+    else:
+        raise ValueError(f"Unknown control group '{control}'; use 'never' or 'notyet'.")
+
+    n_treated = treated.sum(axis=0)
+    n_control = controls.sum(axis=0)
+    valid = cells & (n_treated > 0) & (n_control > 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_treated = (treated * diff).sum(axis=0) / n_treated
+        mean_control = (controls * diff).sum(axis=0) / n_control
+        att = np.where(valid, mean_treated - mean_control, np.nan)
+        influence = n * (treated * (diff - mean_treated) / n_treated
+                         - controls * (diff - mean_control) / n_control)
+    influence = np.where(valid[None], influence, 0.0)
+    return groups, att, influence, valid, n_treated, n_control
+
+
+def aggregate_event_time(groups, att, influence, valid, cohorts):
+    """Cohort-size weighted ATT by event time e = t - g and its influence functions.
+
+    Returns (event_times, att_e, influence_e) with influence_e of shape (N, E).
+    The influence of the estimated cohort shares is included.
+    """
+    n = len(cohorts)
+    n_groups, n_periods = att.shape
+    event = (np.arange(n_periods)[None, :] - groups[:, None])[valid]
+    event_times = np.unique(event)
+    indicator = (event[:, None] == event_times[None, :]).astype(np.float64)     # (C, E)
+
+    share = (cohorts[:, None] == groups[None, :]).mean(axis=0)                  # (G,)
+    member = (cohorts[:, None] == groups[None, :]).astype(np.float64)           # (N, G)
+    cell_group = np.broadcast_to(np.arange(n_groups)[:, None], valid.shape)[valid]
+    p = share[cell_group]                                                        # (C,)
+    total = p @ indicator                                                        # (E,)
+    weights = indicator * p[:, None] / total
+
+    att_cells = att[valid]
+    att_e = att_cells @ weights
+    centred = member[:, cell_group] - p                                          # (N, C)
+    share_influence = (centred @ (indicator * att_cells[:, None]) - (centred @ indicator) * att_e) / total
+    influence_e = influence[:, valid] @ weights + share_influence
+    return event_times, att_e, influence_e
+
+
+def multiplier_bootstrap(influence, reps=999, seed=None, batch_size=500):
+    """Bootstrap standard errors and draws for the estimates behind influence functions (N, K).
+
+    Each draw perturbs the units with Mammen weights; the standard errors are
+    the normalised interquartile range of the (reps, K) draws.
+    """
+    n = influence.shape[0]
+    rng = np.random.default_rng(seed)
+    golden = np.sqrt(5)
+    draws = np.empty((reps, influence.shape[1]))
+    for start in range(0, reps, batch_size):
+        size = min(batch_size, reps - start)
+        v = np.where(rng.random((size, n)) < (golden + 1) / (2 * golden), (1 - golden) / 2, (1 + golden) / 2)
+        draws[start:start + size] = v @ influence / n
+    q25, q75 = np.percentile(draws, [25, 75], axis=0)
+    se = (q75 - q25) / (stats.norm.ppf(0.75) - stats.norm.ppf(0.25))
+    return np.where(se > 0, se, np.nan), draws
+
+
+def uniform_critical_value(draws, se, alpha=0.05):
+    """1 - alpha quantile of the largest studentised deviation across the estimates."""
+    return float(np.quantile(np.nanmax(np.abs(draws) / se, axis=1), 1 - alpha))
+
+
+class EventStudyResult:
+    def __init__(self, group_time, event_time, overall, cohorts, threshold, control, reps, crit):
+        self.group_time = group_time    # one row per identified (cohort, period) cell
+        self.event_time = event_time    # one row per event time, with uniform bands
+        self.overall = overall          # average post-adoption effect: att, se, lower, upper
+        self.cohorts = cohorts          # adoption quarter of every unit ('never'/'always')
+        self.threshold = threshold
+        self.control = control
+        self.reps = reps
+        self.crit = crit
+
+    def summary(self):
+        sizes = self.cohorts.value_counts().sort_index()
+        lines = [
+            "Staggered-Adoption Event Study (Callaway-Sant'Anna)",
+            "=" * 78,
+            f"Adoption: stringency >= {self.threshold:g}    Controls: {self.control}    "
+            f"Bootstrap draws: {self.reps}",
+            "Cohort sizes: " + ", ".join(f"{label} {count}" for label, count in sizes.items()),
+            "-" * 78,
+            self.event_time.to_string(index=False, float_format=lambda v: f"{v:.6g}"),
+            "-" * 78,
+            f"Average post-adoption ATT: {self.overall['att']:.6g}  (SE {self.overall['se']:.6g}, "
+            f"95% CI {self.overall['lower']:.6g} to {self.overall['upper']:.6g})",
+            f"Uniform band critical value: {self.crit:.3f}",
+            "=" * 78,
+        ]
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.summary()
+
+
+def event_study(data, outcome='log_GRP', treatment='Stringency_Index', threshold=70.0, persist=1,
+                control='notyet', base='varying', reps=999, alpha=0.05, seed=None, entity='GbProv', time='Quarter'):
+    """Callaway-Sant'Anna event study of `outcome` around `treatment` threshold crossings.
+
+    `data` is a long panel (columns or MultiIndex). Returns an EventStudyResult
+    with group-time effects, their event-time aggregation and the average
+    effect over event times >= 0, all with multiplier-bootstrap inference.
+    """
+    panel = PanelArray.from_long(data, [outcome, treatment], entity=entity, time=time)
+    y, s = panel[outcome], panel[treatment]
+    n, n_periods = y.shape
+    cohorts = adoption_cohorts(s, threshold, persist)
+    groups, att, influence, valid, n_treated, n_control = group_time_effects(y, cohorts, control, base)
+    if not valid.any():
+        raise ValueError(f"No identified group-time effects at threshold {threshold:g}.")
+    event_times, att_e, influence_e = aggregate_event_time(groups, att, influence, valid, cohorts)
+    post = event_times >= 0
+    influence_all = influence_e[:, post].mean(axis=1)
+
+    stacked = np.column_stack([influence[:, valid], influence_e, influence_all])
+    se, draws = multiplier_bootstrap(stacked, reps=reps, seed=seed)
+    n_cells, n_events = valid.sum(), len(event_times)
+    events = slice(n_cells, n_cells + n_events)
+    se_cells, se_e, se_all = se[:n_cells], se[events], se[-1]
+    crit = uniform_critical_value(draws[:, events], se_e, alpha)
+    z = stats.norm.ppf(1 - alpha / 2)
+
+    periods = panel.times.astype(str)
+    g_idx, t_idx = np.nonzero(valid)
+    group_time = pd.DataFrame({
+        'cohort': periods[groups[g_idx]],
+        'period': periods[t_idx],
+        'event_time': t_idx - groups[g_idx],
+        'att': att[valid],
+        'se': se_cells,
+        'n_treated': n_treated[valid],
+        'n_control': n_control[valid],
+    })
+    event_time = pd.DataFrame({'event_time': event_times, 'att': att_e, 'se': se_e})
+    event_time['lower'] = att_e - crit * se_e
+    event_time['upper'] = att_e + crit * se_e
+    att_all = float(att_e[post].mean())
+    overall = {'att': att_all, 'se': float(se_all), 'lower': att_all - z * se_all, 'upper': att_all + z * se_all}
+
+    labels = periods[np.minimum(cohorts, n_periods - 1)]
+    labels = np.where(cohorts == n_periods, 'never', np.where(cohorts == 0, 'always', labels))
+    cohort_labels = pd.Series(labels, index=panel.entities, name='cohort')
+    return EventStudyResult(group_time, event_time, overall, cohort_labels, threshold, control, reps, crit)
+
+
+def plot_event_study(result, path):
+    """Event-time ATTs with uniform confidence bands."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    table = result.event_time
+    post = table['event_time'] >= 0
+    fig, ax = plt.subplots(figsize=(8, 4.5))
+    for mask, color, label in ((~post, 'tab:gray', 'Pre-adoption'), (post, 'tab:red', 'Post-adoption')):
+        part = table[mask]
+        ax.vlines(part['event_time'], part['lower'], part['upper'], color=color, lw=1.5)
+        ax.scatter(part['event_time'], part['att'], color=color, zorder=3, label=label)
+    ax.axhline(0, color='black', lw=0.8)
+    ax.axvline(-0.5, color='black', lw=0.8, ls='--')
+    ax.set_xlabel('Quarters since stringency first reached the threshold')
+    ax.set_ylabel('ATT on log GRP')
+    ax.set_title(f"Event study: stringency >= {result.threshold:g} ({result.control} controls)")
+    ax.legend(frameon=False)
+    fig.tight_layout()
+    fig.savefig(path, dpi=150)
+    plt.close(fig)
+
+
+if __name__ == '__main__':
+    from panel_data import add_model_variables, load_panel
+
+    parser = argparse.ArgumentParser(description="Event study of GRP around high-stringency adoption.")
+    parser.add_argument('--threshold', type=float, default=70.0)
+    parser.add_argument('--persist', type=int, default=1, help="quarters the threshold must hold")
+    parser.add_argument('--control', choices=['notyet', 'never'], default='notyet')
+    parser.add_argument('--base', choices=['varying', 'universal'], default='varying')
+    parser.add_argument('--reps', type=int, default=999)
+    parser.add_argument('--seed', type=int, default=20200123)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    df_panel = add_model_variables(load_panel(sources=('grp', 'stringency')))
+    result = event_study(df_panel, threshold=args.threshold, persist=args.persist, control=args.control,
+                         base=args.base, reps=args.reps, seed=args.seed)
+    os.makedirs(args.output_dir, exist_ok=True)
+    result.group_time.to_csv(os.path.join(args.output_dir, 'group_time.csv'), index=False)
+    result.event_time.to_csv(os.path.join(args.output_dir, 'event_time.csv'), index=False)
+    plot_event_study(result, os.path.join(args.output_dir, 'event_study.png'))
+    print(result)
@@ -1,37 +1,220 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Load the real GRP data
-try:
-    df_grp_raw = pd.read_csv("China_COVID_measures_cost.xlsx - GRB (Real 2019 Billion RMB).csv")
-except FileNotFoundError:
-    print("Could not find the GRP data file.")
-    exit()
-
-# Reshape to long format for plotting
-quarter_cols = [col for col in df_grp_raw.columns if 'Q' in col and col.startswith('20')]
-panel_grp = df_grp_raw.melt(
-    id_vars=['ProvEN'],
-    value_vars=quarter_cols,
-    var_name='Quarter',
-    value_name='GRP_real'
-)
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from panel_data import DATA_DIR, load_panel
+
+# --- GRP figures ---
+# plot_grp() is the original line plot of a few provinces. render_report()
+# draws the full set of report figures headless (Agg) into results/figures/:
+# one page per province with actual and counterfactual (zero-stringency) GRP,
+# stringency and new cases as small multiples, plus an overview page of
+# actual vs counterfactual GRP for every province. The counterfactual comes
+# from scenarios.ScenarioEngine for a spec, so the data is read from the
+# panel cache and the result store. Each figure's input data is hashed and the
+# hash kept in manifest.json next to the images; figures whose hash is
+# unchanged are skipped and the rest are drawn in a process pool.
 
 # Select a few representative provinces to avoid a cluttered plot
-provinces_to_plot = ['Beijing', 'Guangdong', 'Hubei', 'Xinjiang']
-df_plot = panel_grp[panel_grp['ProvEN'].isin(provinces_to_plot)]
-
-# --- Plotting ---
-plt.style.use('seaborn-v0_8-whitegrid')
-fig, ax = plt.subplots(figsize=(14, 8))
-
-sns.lineplot(data=df_plot, x='Quarter', y='GRP_real', hue='ProvEN', marker='o', ax=ax)
-
-ax.set_title('Quarterly Real GRP for Select Provinces (2020-2022)', fontsize=16, fontweight='bold')
-ax.set_xlabel('Quarter', fontsize=12)
-ax.set_ylabel('Real GRP (2019 Billion RMB)', fontsize=12)
-ax.tick_params(axis='x', rotation=45)
-ax.legend(title='Province')
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+PROVINCES_TO_PLOT = ['Beijing', 'Guangdong', 'Hubei', 'Xinjiang']
+
+FIGURE_DIR = os.path.join(DATA_DIR, 'results', 'figures')
+MANIFEST_FILE = 'manifest.json'
+# Bump when the drawing code changes so every figure is redrawn.
+RENDER_VERSION = 1
+
+
+def plot_grp(panel_grp, provinces=PROVINCES_TO_PLOT, output=None):
+    """Line plot of quarterly real GRP for `provinces`; saved to `output` or shown."""
+    import matplotlib
+    if output is not None:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    panel_grp = panel_grp.astype({'ProvEN': str, 'Quarter': str})
+    df_plot = panel_grp[panel_grp['ProvEN'].isin(provinces)]
+
+    # --- Plotting ---
+    plt.style.use('seaborn-v0_8-whitegrid')
+    fig, ax = plt.subplots(figsize=(14, 8))
+
+    sns.lineplot(data=df_plot, x='Quarter', y='GRP_real', hue='ProvEN', marker='o', ax=ax)
+
+    ax.set_title('Quarterly Real GRP for Select Provinces (2020-2022)', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Quarter', fontsize=12)
+    ax.set_ylabel('Real GRP (2019 Billion RMB)', fontsize=12)
+    ax.tick_params(axis='x', rotation=45)
+    ax.legend(title='Province')
+    plt.tight_layout()
+    if output is None:
+        plt.show()
+    else:
+        fig.savefig(output, dpi=150)
+        plt.close(fig)
+
+
+def _values(array):
+    return [None if np.isnan(v) else float(v) for v in np.asarray(array, dtype=np.float64)]
+
+
+def report_payloads(spec='twfe'):
+    """Input data of every report figure, as {file name: JSON-serialisable payload}."""
+    from scenarios import ScenarioEngine
+
+    engine = ScenarioEngine.from_spec(spec)
+    counterfactual = engine.counterfactual(np.zeros(engine.shape))
+    cases = load_panel(sources=('cases',)).astype({'ProvEN': str, 'Quarter': str})
+    cases = cases.pivot_table(index='ProvEN', columns='Quarter', values='Covid_Cases_per_mil', dropna=False)
+    cases = cases.reindex(index=engine.entities, columns=engine.quarters).to_numpy()
+
+    quarters = list(engine.quarters)
+    payloads = {
+        'overview.png': {
+            'kind': 'overview', 'spec': spec, 'quarters': quarters, 'provinces': list(engine.entities),
+            'grp': [_values(row) for row in engine.grp],
+            'counterfactual': [_values(row) for row in counterfactual],
+        },
+    }
+    for i, province in enumerate(engine.entities):
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', province).strip('_')
+        payloads[f'province_{slug}.png'] = {
+            'kind': 'province', 'spec': spec, 'quarters': quarters, 'province': province,
+            'grp': _values(engine.grp[i]), 'counterfactual': _values(counterfactual[i]),
+            'stringency': _values(engine.stringency[i]), 'cases': _values(cases[i]),
+        }
+    return payloads
+
+
+def payload_hash(payload):
+    text = json.dumps({'version': RENDER_VERSION, 'payload': payload}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _series(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def render_figure(path, payload):
+    """Draw one report figure to `path` with the non-interactive Agg backend."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    x = np.arange(len(payload['quarters']))
+    ticks = x[::2]
+    labels = payload['quarters'][::2]
+    if payload['kind'] == 'province':
+        fig, axes = plt.subplots(3, 1, sharex=True, figsize=(7, 7.5),
+                                 gridspec_kw={'height_ratios': [2, 1, 1]})
+        grp_ax, stringency_ax, cases_ax = axes
+        grp_ax.plot(x, _series(payload['grp']), marker='o', color='tab:blue', label='Actual')
+        grp_ax.plot(x, _series(payload['counterfactual']), marker='o', ls='--', color='tab:orange',
+                    label='Zero stringency')
+        grp_ax.set_ylabel('Real GRP (2019 bn RMB)')
+        grp_ax.legend(frameon=False)
+        grp_ax.set_title(f"{payload['province']} ({payload['spec']})")
+        stringency_ax.bar(x, _series(payload['stringency']), color='tab:red', alpha=0.7)
+        stringency_ax.set_ylabel('Stringency')
+        stringency_ax.set_ylim(0, 100)
+        cases_ax.bar(x, _series(payload['cases']), color='tab:gray')
+        cases_ax.set_ylabel('New cases / mil')
+        cases_ax.set_xticks(ticks)
+        cases_ax.set_xticklabels(labels, rotation=45)
+    elif payload['kind'] == 'overview':
+        provinces = payload['provinces']
+        ncols = 6
+        nrows = -(-len(provinces) // ncols)
+        fig, axes = plt.subplots(nrows, ncols, sharex=True, figsize=(ncols * 2.6, nrows * 2.0))
+        axes = np.atleast_1d(axes).ravel()
+        for ax, name, grp, cf in zip(axes, provinces, payload['grp'], payload['counterfactual']):
+            ax.plot(x, _series(grp), color='tab:blue', lw=1.2)
+            ax.plot(x, _series(cf), color='tab:orange', lw=1.2, ls='--')
+            ax.set_title(name, fontsize=8)
+            ax.tick_params(labelsize=6)
+            ax.set_xticks(ticks)
+            ax.set_xticklabels(labels, rotation=90)
+        for ax in axes[len(provinces):]:
+            ax.set_axis_off()
+        fig.suptitle(f"Actual (solid) vs zero-stringency (dashed) real GRP, 2019 bn RMB ({payload['spec']})")
+    else:
+        raise ValueError(f"Unknown figure kind '{payload['kind']}'.")
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+    return path
+
+
+def _render_task(task):
+    return render_figure(*task)
+
+
+def _load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def render_report(spec='twfe', output_dir=FIGURE_DIR, n_jobs=None, force=False):
+    """Render every report figure whose input changed; returns (rendered, skipped) file names."""
+    payloads = report_payloads(spec)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+    hashes = {name: payload_hash(payload) for name, payload in payloads.items()}
+    todo = [name for name in payloads
+            if force or manifest.get(name) != hashes[name] or not os.path.exists(os.path.join(output_dir, name))]
+    tasks = [(os.path.join(output_dir, name), payloads[name]) for name in todo]
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+            list(pool.map(_render_task, tasks))
+    else:
+        for task in tasks:
+            _render_task(task)
+
+    _write_manifest(output_dir, {name: hashes[name] for name in payloads})
+    skipped = [name for name in payloads if name not in todo]
+    return todo, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plot real GRP, or render the per-province report figures.")
+    parser.add_argument('--report', action='store_true',
+                        help="render every province page and the overview into --output-dir")
+    parser.add_argument('--spec', default='twfe', help="model spec for the counterfactual (see specs.py)")
+    parser.add_argument('--output-dir', default=FIGURE_DIR)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--force', action='store_true', help="redraw figures even if their input is unchanged")
+    parser.add_argument('--provinces', nargs='+', default=PROVINCES_TO_PLOT, help="provinces of the single plot")
+    parser.add_argument('--output', help="image file for the single plot instead of opening a window")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.report:
+            rendered, skipped = render_report(args.spec, args.output_dir, n_jobs=args.jobs, force=args.force)
+            print(f"Rendered {len(rendered)} figures, {len(skipped)} unchanged, in {args.output_dir}")
+        else:
+            # Load the real GRP data in long format for plotting
+            plot_grp(load_panel(sources=('grp',)), args.provinces, args.output)
+    except FileNotFoundError:
+        print("Could not find the GRP data file.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from twfe_engine import TWFEResults, fit_twfe
+
+# --- Incremental TWFE on a balanced panel ---
+# For a balanced panel the two-way within transform is
+#     z~_it = z_it - zbar_i - m_t + zbar,   m_t = cross-sectional mean in period t.
+# Writing a_it = z_it - m_t, each entity's within cross-product is
+#     Z~_i'Z~_i = A_i'A_i - T abar_i abar_i',
+#     A_i'A_i  = R_i - C_i - C_i' + Q,
+# with R_i = sum_t z_it z_it', C_i = sum_t z_it m_t', Q = sum_t m_t m_t' and
+# abar_i = (S_i - sum_t m_t) / T, S_i = sum_t z_it. Every one of these is a
+# running sum over periods, and the period means of past quarters do not change
+# when a quarter is appended, so a new quarter is absorbed in O(N K^2) without
+# touching the history. The per-entity cross-products give both the estimate
+# and the entity-clustered covariance (the same one fit_twfe/PanelOLS report).
+
+
+class TWFESufficientStats:
+    """Running sufficient statistics of an entity-clustered two-way FE regression."""
+
+    def __init__(self, dependent, exog, entities, entity='GbProv', time='Time'):
+        self.dependent = dependent
+        self.exog = list(exog)
+        self.entity = entity
+        self.time = time
+        self.entities = pd.Index(entities)
+        self.periods = []
+        n, p = len(self.entities), 1 + len(self.exog)
+        self.raw = np.zeros((n, p, p))        # R_i
+        self.cross = np.zeros((n, p, p))      # C_i
+        self.sums = np.zeros((n, p))          # S_i
+        self.mean_outer = np.zeros((p, p))    # Q
+        self.mean_sum = np.zeros(p)           # sum_t m_t
+
+    @classmethod
+    def from_frame(cls, data, dependent, exog, entity='GbProv', time='Time'):
+        """Accumulate every period of a balanced long panel, in time order."""
+        if isinstance(data.index, pd.MultiIndex):
+            data = data.reset_index()
+        stats = cls(dependent, exog, sorted(data[entity].unique()), entity, time)
+        for _, period in data.groupby(time, sort=True, observed=True):
+            stats.append(period)
+        return stats
+
+    @property
+    def n_periods(self):
+        return len(self.periods)
+
+    @property
+    def nobs(self):
+        return len(self.entities) * self.n_periods
+
+    def append(self, period):
+        """Add one new period: a frame with exactly one row per entity."""
+        labels = period[self.time].unique()
+        if len(labels) != 1:
+            raise ValueError("append() takes the rows of a single period.")
+        label = labels[0]
+        if label in self.periods:
+            raise ValueError(f"Period {label!r} has already been added.")
+        rows = period.set_index(self.entity)[[self.dependent] + self.exog]
+        if len(rows) != len(self.entities) or not rows.index.isin(self.entities).all():
+            raise ValueError(f"Period {label!r} must have one row for each of the {len(self.entities)} entities.")
+        z = rows.reindex(self.entities).to_numpy(dtype=np.float64)
+        if np.isnan(z).any():
+            raise ValueError(f"Period {label!r} has missing values; incremental updates need a balanced panel.")
+
+        m = z.mean(axis=0)
+        self.raw += np.einsum('ip,iq->ipq', z, z)
+        self.cross += np.einsum('ip,q->ipq', z, m)
+        self.sums += z
+        self.mean_outer += np.outer(m, m)
+        self.mean_sum += m
+        self.periods.append(label)
+
+    def entity_crossproducts(self):
+        """Within-transformed Z~_i'Z~_i for every entity, shape (N, 1+k, 1+k)."""
+        t = self.n_periods
+        aa = self.raw - self.cross - self.cross.transpose(0, 2, 1) + self.mean_outer
+        abar = (self.sums - self.mean_sum) / t
+        return aa - t * np.einsum('ip,iq->ipq', abar, abar)
+
+    def results(self):
+        """Estimate and entity-clustered covariance from the current statistics.
+
+        The returned TWFEResults carries no per-observation arrays (x, y,
+        resid are None); refit with fit_twfe where those are needed.
+        """
+        zz_i = self.entity_crossproducts()
+        zz = zz_i.sum(axis=0)
+        xx, xy = zz[1:, 1:], zz[1:, 0]
+        params = np.linalg.solve(xx, xy)
+        scores = zz_i[:, 1:, 0] - zz_i[:, 1:, 1:] @ params
+
+        n_entities, k = len(self.entities), len(self.exog)
+        nobs = self.nobs
+        df_absorbed = n_entities + self.n_periods - 1
+        scale = nobs / (nobs - df_absorbed - k)
+        xxi = np.linalg.inv(xx)
+        cov = xxi @ (scores.T @ scores) @ xxi * scale
+        cov = (cov + cov.T) / 2
+        return TWFEResults(
+            params=pd.Series(params, index=self.exog, name='parameter'),
+            cov=pd.DataFrame(cov, index=self.exog, columns=self.exog),
+            nobs=nobs,
+            df_resid=nobs - k - df_absorbed,
+            df_absorbed=df_absorbed,
+            cov_type='clustered',
+            entity_codes=None, time_codes=None, clusters=None,
+            x=None, y=None, resid=None,
+            n_entities=n_entities,
+            n_periods=self.n_periods,
+            iterations=0,
+            converged=True,
+        )
+
+    def refit_check(self, data, rtol=1e-8):
+        """Refit `data` from scratch with fit_twfe and compare with the running estimate.
+
+        Returns the largest relative differences in params and standard errors;
+        raises AssertionError if either exceeds `rtol`.
+        """
+        incremental = self.results()
+        full = fit_twfe(data, self.dependent, self.exog, entity=self.entity, time=self.time)
+        diff = {
+            'params': float(np.max(np.abs(incremental.params / full.params - 1))),
+            'std_errors': float(np.max(np.abs(incremental.std_errors / full.std_errors - 1))),
+        }
+        if max(diff.values()) > rtol:
+            raise AssertionError(f"Incremental and full refits disagree: {diff}")
+        return diff
@@ -0,0 +1,121 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from incremental_twfe import TWFESufficientStats
+from policy_cost import cost_for_params
+from twfe_engine import fit_twfe
+
+# --- Leave-one-province-out influence ---
+# With 31 provinces a single one can move the stringency coefficient. Rather
+# than refitting once per province, the drop-one estimates are obtained by
+# downdating the pooled within cross-products kept by TWFESufficientStats.
+# Dropping entity g changes the period means to m'_t = (N m_t - z_gt)/(N-1),
+# and with R, C, S the per-entity sums (see incremental_twfe.py) the within
+# cross-product of the remaining N-1 entities is
+#     R_tot - R_g - (N-1) Q' - (SS_tot - S_g S_g' - (N-1) M' M') / T
+# where Q' = (N^2 Q - N (C_g + C_g') + R_g) / (N-1)^2, M' = (N M - S_g)/(N-1)
+# and SS_tot = sum_i S_i S_i'. Every term is a per-entity array, so all N
+# drops are one batched (N, k, k) solve, which can also be split over a
+# process pool when there are thousands of entities.
+
+
+def _downdate_params(stats, rows):
+    raw, cross, sums = stats.raw, stats.cross, stats.sums
+    n = len(stats.entities)
+    t = stats.n_periods
+    raw_g, cross_g, sums_g = raw[rows], cross[rows], sums[rows]
+    q_new = (n ** 2 * stats.mean_outer - n * (cross_g + cross_g.transpose(0, 2, 1)) + raw_g) / (n - 1) ** 2
+    m_new = (n * stats.mean_sum - sums_g) / (n - 1)
+    ss_tot = np.einsum('ip,iq->pq', sums, sums)
+    zz = (raw.sum(axis=0) - raw_g - (n - 1) * q_new
+          - (ss_tot - np.einsum('gp,gq->gpq', sums_g, sums_g) - (n - 1) * np.einsum('gp,gq->gpq', m_new, m_new)) / t)
+    return np.linalg.solve(zz[:, 1:, 1:], zz[:, 1:, 0:1])[:, :, 0]
+
+
+def _downdate_chunk(args):
+    return _downdate_params(*args)
+
+
+def _refit_one(args):
+    data, dependent, exog, entity, time, dropped = args
+    return fit_twfe(data[data[entity] != dropped], dependent, exog, entity=entity, time=time).params.to_numpy()
+
+
+def leave_one_out(data, dependent, exog, entity='GbProv', time='Time', method='downdate', n_jobs=1,
+                  cost_data=None, cost_terms=None, grp_col='GRP_real_actual'):
+    """Coefficients (and optionally the policy cost) with each entity dropped in turn.
+
+    `method='downdate'` needs a balanced panel and uses the sufficient
+    statistics; `method='refit'` re-estimates with fit_twfe for each entity
+    and works on any panel. With `n_jobs` > 1 the entities are split across a
+    process pool. If `cost_data` and `cost_terms` are given, the national
+    policy cost implied by each drop-one coefficient vector is added as a
+    'cost' column (computed on all of `cost_data`).
+
+    Returns a frame indexed by the dropped entity, with a first 'none' row
+    holding the full-sample estimate.
+    """
+    exog = list(exog)
+    if isinstance(data.index, pd.MultiIndex):
+        data = data.reset_index()
+    full = fit_twfe(data, dependent, exog, entity=entity, time=time).params.to_numpy()
+
+    if method == 'downdate':
+        stats = TWFESufficientStats.from_frame(data, dependent, exog, entity=entity, time=time)
+        entities = stats.entities
+        chunks = np.array_split(np.arange(len(entities)), max(n_jobs, 1))
+        tasks = [(stats, rows) for rows in chunks if len(rows)]
+        if n_jobs > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                params = np.vstack(list(pool.map(_downdate_chunk, tasks)))
+        else:
+            params = np.vstack([_downdate_chunk(task) for task in tasks])
+    elif method == 'refit':
+        entities = pd.Index(sorted(data[entity].unique()))
+        tasks = [(data, dependent, exog, entity, time, e) for e in entities]
+        if n_jobs > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                params = np.vstack(list(pool.map(_refit_one, tasks)))
+        else:
+            params = np.vstack([_refit_one(task) for task in tasks])
+    else:
+        raise ValueError(f"Unknown method '{method}'; use 'downdate' or 'refit'.")
+
+    table = pd.DataFrame(np.vstack([full, params]), columns=exog,
+                         index=pd.Index(['none'] + list(entities), name='dropped'))
+    if cost_data is not None and cost_terms is not None:
+        cost_terms = list(cost_terms)
+        betas = table[cost_terms].to_numpy()
+        table['cost'] = cost_for_params(cost_data[grp_col], cost_data[cost_terms], betas)
+    return table
+
+
+def jackknife_se(table):
+    """Jackknife standard errors from a leave_one_out table."""
+    drops = table.drop(index='none')
+    n = len(drops)
+    return np.sqrt((n - 1) / n * ((drops - drops.mean()) ** 2).sum()).rename('jackknife_se')
+
+
+if __name__ == '__main__':
+    from panel_data import add_model_variables, load_panel
+
+    df_panel = add_model_variables(load_panel())
+    df_cost = load_panel(sources=('grp', 'stringency')).rename(columns={'GRP_real': 'GRP_real_actual'})
+    names = dict(zip(df_panel['GbProv'].astype(int), df_panel['ProvEN'].astype(str)))
+
+    table = leave_one_out(df_panel, 'log_GRP', ['Stringency_Index', 'Covid_Cases'],
+                          cost_data=df_cost, cost_terms=['Stringency_Index'])
+    table.index = ['(none)'] + [names[int(e)] for e in table.index[1:]]
+    table['cost'] /= 1000
+
+    print("==============================================================================")
+    print("   Leave-One-Province-Out Influence on the Baseline TWFE Model")
+    print("==============================================================================")
+    with pd.option_context('display.float_format', '{:,.6f}'.format, 'display.max_rows', None):
+        print(table.rename(columns={'cost': 'cost (Trillion 2019 RMB)'}).sort_values('Stringency_Index'))
+    print("------------------------------------------------------------------------------")
+    print(jackknife_se(table.drop(columns='cost').rename(index={'(none)': 'none'})))
+    print("==============================================================================")
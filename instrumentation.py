@@ -0,0 +1,110 @@
+import contextlib
+import datetime
+import json
+import os
+import sys
+import time
+
+# --- Run instrumentation ---
+# A script opens a run with start_run('<script name>') and wraps its stages in
+# `with stage('fit') as info: ...`. Each stage records its wall time, the peak
+# RSS of the process when it ends and anything put in `info` (row counts in
+# particular). panel_data reports its own load/reshape/merge stages and the
+# hashes of the input files, so a script only wraps what it does itself.
+# run.write() saves the record as results/<name>.run.json, beside the printed
+# results. Without an active run, stage() is a no-op, so library code can be
+# instrumented unconditionally.
+#
+# Verbosity: PIPELINE_VERBOSE=0 in the environment turns off the debugging
+# prints of the scripts (see verbose()), for batch runs.
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+_ACTIVE = None
+
+
+def verbose():
+    """False when PIPELINE_VERBOSE is set to 0 (or 'false'/'no')."""
+    return os.environ.get('PIPELINE_VERBOSE', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unknown)."""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, 'peak_wset', info.rss) / 2 ** 20
+
+
+class RunRecord:
+    def __init__(self, name):
+        self.name = name
+        self.started = datetime.datetime.now().isoformat(timespec='seconds')
+        self.inputs = {}
+        self.stages = []
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name, **details):
+        info = dict(details)
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            entry = {'stage': name, 'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}
+            entry.update(info)
+            self.stages.append(entry)
+
+    def add_inputs(self, hashes):
+        self.inputs.update(hashes)
+
+    def to_dict(self):
+        return {
+            'run': self.name,
+            'started': self.started,
+            'seconds': time.perf_counter() - self._start,
+            'peak_rss_mb': peak_rss_mb(),
+            'python': sys.version.split()[0],
+            'inputs': self.inputs,
+            'stages': self.stages,
+        }
+
+    def write(self, directory=RESULTS_DIR):
+        """Write results/<name>.run.json and return its path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.name}.run.json")
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        return path
+
+
+def start_run(name):
+    """Start recording a run; stage() calls are attributed to it from now on."""
+    global _ACTIVE
+    _ACTIVE = RunRecord(name)
+    return _ACTIVE
+
+
+@contextlib.contextmanager
+def stage(name, **details):
+    """Record a stage of the active run (a no-op yielding a scratch dict without one)."""
+    if _ACTIVE is None:
+        yield dict(details)
+        return
+    with _ACTIVE.stage(name, **details) as info:
+        yield info
+
+
+def record_inputs(hashes):
+    if _ACTIVE is not None:
+        _ACTIVE.add_inputs(hashes)
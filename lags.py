@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+# --- Distributed lags and leads ---
+# Lags and leads of any set of variables are gathered in one vectorized pass:
+# each row's (entity, period) position is looked up in a dense
+# (entity x period) grid of row numbers, so the value k periods back is a
+# single fancy-indexing step for all variables at once. Periods are the
+# sorted unique values of the time column, so an entity missing a quarter
+# gets a missing lag there instead of the value from two quarters back.
+#
+# Column names follow the scripts: Stringency_Index_L1, Covid_Cases_F2, and
+# for moderator interactions Stringency_x_Urban, Stringency_L1_x_Urban.
+
+EDGE_RULES = ('drop', 'zero', 'pre')
+
+# Short names used in interaction column names.
+SHORT_NAMES = {
+    'Stringency_Index': 'Stringency',
+    'Urbanization_Rate': 'Urban',
+}
+
+
+def lag_name(variable, k):
+    """Column name of lag k (k > 0), lead -k (k < 0) or the level (k == 0)."""
+    if k == 0:
+        return variable
+    return f"{variable}_L{k}" if k > 0 else f"{variable}_F{-k}"
+
+
+def interaction_name(variable, k, moderator):
+    short = SHORT_NAMES.get(variable, variable)
+    if k:
+        short += f"_L{k}" if k > 0 else f"_F{-k}"
+    return f"{short}_x_{SHORT_NAMES.get(moderator, moderator)}"
+
+
+def moderator_list(moderator):
+    """None, one moderator name or a list of them, as a list."""
+    if moderator is None:
+        return []
+    return [moderator] if isinstance(moderator, str) else list(moderator)
+
+
+def _shifts(lags, leads):
+    lags = range(1, lags + 1) if isinstance(lags, int) else lags
+    leads = range(1, leads + 1) if isinstance(leads, int) else leads
+    return [int(k) for k in lags] + [-int(k) for k in leads]
+
+
+def add_lags(df, variables, lags=1, leads=0, entity='GbProv', time='Time', edge='zero', pre_values=None,
+             moderator=None, interact=()):
+    """Return a copy of `df` with lag/lead columns (and interactions) added.
+
+    `lags`/`leads` are a count (1..n) or an explicit iterable of orders.
+    `edge` decides what happens where the shifted period is outside the panel
+    (or missing for that entity): 'drop' removes those rows, 'zero' fills the
+    new columns with 0, and 'pre' fills them with pre-period values, taken from
+    `pre_values` ({variable: scalar or Series indexed by entity}) when given,
+    otherwise the entity's first (for lags) or last (for leads) observed value.
+    Only the new columns are ever filled.
+
+    With a `moderator` column (or a list of them), every variable in
+    `interact` also gets <var>_x_<moderator> interaction columns for the level
+    and each shift.
+    """
+    if edge not in EDGE_RULES:
+        raise ValueError(f"edge must be one of {EDGE_RULES}, not {edge!r}")
+    variables = list(variables)
+    shifts = _shifts(lags, leads)
+    out = df.copy()
+    if isinstance(out.index, pd.MultiIndex):
+        out = out.reset_index()
+
+    e_codes, entities = pd.factorize(out[entity], sort=True)
+    t_codes, periods = pd.factorize(out[time], sort=True)
+    grid = np.full((len(entities), len(periods)), -1, dtype=np.intp)
+    grid[e_codes, t_codes] = np.arange(len(out))
+    values = out[variables].to_numpy(dtype=np.float64)
+
+    missing_rows = np.zeros(len(out), dtype=bool)
+    new_cols = {}
+    for k in shifts:
+        src_t = t_codes - k
+        inside = (src_t >= 0) & (src_t < len(periods))
+        src = np.where(inside, grid[e_codes, np.clip(src_t, 0, len(periods) - 1)], -1)
+        shifted = np.where((src >= 0)[:, None], values[np.maximum(src, 0)], np.nan)
+        gap = src < 0
+        missing_rows |= gap
+        if edge == 'zero':
+            shifted[gap] = 0.0
+        elif edge == 'pre':
+            shifted[gap] = _pre_fill(out, variables, e_codes, entities, grid, k, pre_values, entity)[gap]
+        for j, var in enumerate(variables):
+            new_cols[lag_name(var, k)] = shifted[:, j]
+
+    for mod_name in moderator_list(moderator):
+        mod = out[mod_name].to_numpy(dtype=np.float64)
+        for var in interact:
+            for k in [0] + shifts:
+                source = out[var].to_numpy(dtype=np.float64) if k == 0 else new_cols[lag_name(var, k)]
+                new_cols[interaction_name(var, k, mod_name)] = source * mod
+
+    out = out.assign(**new_cols)
+    if edge == 'drop':
+        out = out[~missing_rows]
+    return out
+
+
+def _pre_fill(df, variables, e_codes, entities, grid, k, pre_values, entity):
+    # First (lags) or last (leads) observed row of each entity.
+    order = np.where(grid >= 0, np.arange(grid.shape[1]), grid.shape[1] if k > 0 else -1)
+    pick = order.min(axis=1) if k > 0 else order.max(axis=1)
+    edge_rows = grid[np.arange(len(entities)), np.clip(pick, 0, grid.shape[1] - 1)]
+    fill = df[variables].to_numpy(dtype=np.float64)[edge_rows][e_codes]
+    for j, var in enumerate(variables):
+        if pre_values and var in pre_values:
+            given = pre_values[var]
+            if isinstance(given, pd.Series):
+                fill[:, j] = given.reindex(entities).to_numpy(dtype=np.float64)[e_codes]
+            else:
+                fill[:, j] = float(given)
+    return fill
+
+
+def distributed_lag_terms(variables, lags=1, leads=0, moderator=None, interact=()):
+    """Regressor names for a distributed-lag model built by add_lags.
+
+    Levels and shifts of each variable, then the interaction columns, in the
+    order the scripts list them (level, L1, ..., Ln for each variable).
+    """
+    shifts = [0] + _shifts(lags, leads)
+    terms = [lag_name(var, k) for var in variables for k in shifts]
+    terms += [interaction_name(var, k, mod) for mod in moderator_list(moderator) for var in interact for k in shifts]
+    return terms
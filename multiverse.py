@@ -0,0 +1,218 @@
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from lags import add_lags, distributed_lag_terms, moderator_list
+from panel_data import DATA_DIR, add_model_variables, add_moderators, load_moderators, load_panel
+from twfe_engine import fit_twfe
+
+# --- Specification curve over the family of TWFE models ---
+# The scripts are hand-forked variants of one regression. Here the variants are
+# a declarative grid (DEFAULT_GRID, or a JSON file with the same keys):
+#   lags       number of quarterly lags of stringency and the case control
+#   cases      case control: 'level' (cases per person, as in the scripts),
+#              'per_mil', 'log' (log1p of cases per million) or 'none'
+#   window     sample window, a key of WINDOWS
+#   edge       lag edge rule of lags.add_lags ('drop', 'zero', 'pre')
+#   moderator  None, a column of province_moderators.csv or a list of them
+#              (interacted with stringency)
+# Every combination is fitted with fit_twfe on one shared panel built once
+# (GRP and stringency through 2023Q1, cases through 2022Q4, so 2023 only adds
+# observations to specs without a case control). Specs are spread over a
+# process pool. The output is a tidy table of every coefficient, one row per
+# spec with the cumulative stringency effect (level plus lags, at the mean
+# urbanization when moderated), and a specification-curve figure.
+
+OUTPUT_DIR = os.path.join(DATA_DIR, 'results', 'multiverse')
+
+DEFAULT_GRID = {
+    'lags': [0, 1, 2],
+    'cases': ['level', 'per_mil', 'log', 'none'],
+    'window': ['2020-2022', '2020-2023'],
+    'edge': ['zero', 'drop', 'pre'],
+    'moderator': [None, 'Urbanization_Rate'],
+}
+
+WINDOWS = {
+    '2020-2022': ('2020Q1', '2022Q4'),
+    '2020-2023': ('2020Q1', '2023Q4'),
+}
+
+CASE_COLUMNS = {'level': 'Covid_Cases', 'per_mil': 'Covid_Cases_per_mil', 'log': 'log_Covid_Cases'}
+
+_PANEL = None
+
+
+def load_grid(path):
+    with open(path) as f:
+        grid = json.load(f)
+    unknown = set(grid) - set(DEFAULT_GRID)
+    if unknown:
+        raise ValueError(f"Unknown grid keys: {', '.join(sorted(unknown))}")
+    return {**DEFAULT_GRID, **grid}
+
+
+def expand_grid(grid=DEFAULT_GRID):
+    """One dict per combination; the edge rule is only varied for specs with lags."""
+    keys = list(DEFAULT_GRID)
+    specs, seen = [], set()
+    for values in itertools.product(*(grid[key] for key in keys)):
+        spec = {key: tuple(value) if isinstance(value, list) else value for key, value in zip(keys, values)}
+        if spec['lags'] == 0:
+            spec['edge'] = None
+        ident = tuple(spec.values())
+        if ident not in seen:
+            seen.add(ident)
+            specs.append(spec)
+    for i, spec in enumerate(specs):
+        spec['spec_id'] = i
+    return specs
+
+
+def shared_panel():
+    """The panel every spec starts from: all quarters of GRP and stringency, the
+    case variants (missing after 2022Q4) and every province moderator."""
+    panel = load_panel(sources=('grp', 'stringency'))
+    cases = load_panel(sources=('cases',))
+    cases = cases.set_index([cases['GbProv'].astype(int), cases['Quarter'].astype(str)])['Covid_Cases_per_mil']
+    keys = pd.MultiIndex.from_arrays([panel['GbProv'].astype(int), panel['Quarter'].astype(str)])
+    panel['Covid_Cases_per_mil'] = cases.reindex(keys).to_numpy()
+    panel = add_model_variables(panel)
+    panel['log_Covid_Cases'] = np.log1p(panel['Covid_Cases_per_mil'])
+    panel = add_moderators(panel, list(load_moderators().columns))
+    panel['Quarter_label'] = panel['Quarter'].astype(str)
+    return panel
+
+
+def spec_frame(panel, spec):
+    """Estimation frame and regressor names for one grid spec."""
+    case_col = CASE_COLUMNS.get(spec['cases'])
+    variables = ['Stringency_Index'] + ([case_col] if case_col else [])
+    start, end = WINDOWS[spec['window']]
+    df = panel[(panel['Quarter_label'] >= start) & (panel['Quarter_label'] <= end)]
+    if case_col:
+        df = df.dropna(subset=[case_col])
+    moderator = spec['moderator']
+    if moderator_list(moderator):
+        df = df.dropna(subset=moderator_list(moderator))
+    interact = ['Stringency_Index'] if moderator_list(moderator) else ()
+    df = add_lags(df, variables, lags=spec['lags'], edge=spec['edge'] or 'zero',
+                  moderator=moderator, interact=interact)
+    exog = distributed_lag_terms(variables, lags=spec['lags'], moderator=moderator, interact=interact)
+    return df, exog
+
+
+def _init_worker(panel):
+    global _PANEL
+    _PANEL = panel
+
+
+def _fit_one(spec):
+    df, exog = spec_frame(_PANEL, spec)
+    try:
+        results = fit_twfe(df, 'log_GRP', exog)
+    except (ValueError, np.linalg.LinAlgError) as e:
+        return spec, None, str(e)
+
+    table = pd.DataFrame({'estimate': results.params, 'std_error': results.std_errors,
+                          'pvalue': results.pvalues})
+    # Cumulative stringency effect: level plus lags, each interaction weighted
+    # by the mean of its moderator in the estimation sample.
+    weights = pd.Series(0.0, index=exog)
+    weights[distributed_lag_terms(['Stringency_Index'], lags=spec['lags'])] = 1.0
+    for mod in moderator_list(spec['moderator']):
+        interactions = distributed_lag_terms([], lags=spec['lags'], moderator=mod, interact=['Stringency_Index'])
+        weights[interactions] = df[mod].mean()
+    effect = float(weights @ results.params)
+    effect_se = float(np.sqrt(weights @ results.cov @ weights))
+    q = stats.t.ppf(0.975, results.df_resid)
+    summary = {'nobs': int(results.nobs), 'effect': effect, 'effect_se': effect_se,
+               'lower': effect - q * effect_se, 'upper': effect + q * effect_se}
+    return spec, (table, summary), None
+
+
+def run_multiverse(grid=DEFAULT_GRID, n_jobs=1, panel=None):
+    """Fit every spec of `grid`; returns (coefficients, specs) tidy frames."""
+    specs = expand_grid(grid)
+    panel = shared_panel() if panel is None else panel
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(panel,)) as pool:
+            fitted = list(pool.map(_fit_one, specs, chunksize=max(1, len(specs) // (4 * n_jobs))))
+    else:
+        _init_worker(panel)
+        fitted = [_fit_one(spec) for spec in specs]
+
+    coef_rows, spec_rows = [], []
+    for spec, out, error in fitted:
+        row = dict(spec)
+        if out is None:
+            row.update({'nobs': None, 'effect': np.nan, 'effect_se': np.nan, 'lower': np.nan, 'upper': np.nan,
+                        'error': error})
+        else:
+            table, summary = out
+            row.update(summary)
+            row['error'] = None
+            for term, values in table.iterrows():
+                coef_rows.append({**spec, 'term': term, **values.to_dict(), 'nobs': summary['nobs']})
+        spec_rows.append(row)
+    return pd.DataFrame(coef_rows), pd.DataFrame(spec_rows)
+
+
+def plot_spec_curve(specs_table, path):
+    """Specification curve: sorted effects with 95% CIs above, choices below."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    table = specs_table.dropna(subset=['effect']).sort_values('effect').reset_index(drop=True)
+    choices = table[list(DEFAULT_GRID)].map(lambda v: 'none' if pd.isna(v) else str(v))
+    dims = [key for key in DEFAULT_GRID if choices[key].nunique() > 1]
+    rows = [(dim, value) for dim in dims for value in sorted(choices[dim].unique())]
+    x = np.arange(len(table))
+
+    fig, (top, bottom) = plt.subplots(2, 1, sharex=True, figsize=(max(8, len(table) * 0.08), 4 + 0.25 * len(rows)),
+                                      gridspec_kw={'height_ratios': [2, max(1, len(rows) * 0.15)]})
+    significant = (table['lower'] > 0) | (table['upper'] < 0)
+    top.vlines(x, table['lower'], table['upper'], color=np.where(significant, 'tab:blue', 'lightgray'), lw=1)
+    top.scatter(x, table['effect'], s=8, color=np.where(significant, 'tab:blue', 'gray'), zorder=3)
+    top.axhline(0, color='black', lw=0.8)
+    top.set_ylabel('Cumulative stringency effect')
+    top.set_title(f'Specification curve ({len(table)} specifications)')
+
+    for i, (dim, value) in enumerate(rows):
+        chosen = (choices[dim] == value).to_numpy()
+        bottom.scatter(x[chosen], np.full(chosen.sum(), i), s=6, marker='s', color='black')
+    bottom.set_yticks(range(len(rows)))
+    bottom.set_yticklabels([f"{dim}: {value}" for dim, value in rows], fontsize=7)
+    bottom.invert_yaxis()
+    bottom.set_xlabel('Specification (sorted by effect)')
+    fig.tight_layout()
+    fig.savefig(path, dpi=150)
+    plt.close(fig)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fit every TWFE specification of a grid and plot the curve.")
+    parser.add_argument('--config', help="JSON file overriding keys of DEFAULT_GRID")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    grid = load_grid(args.config) if args.config else DEFAULT_GRID
+    coefficients, specs_table = run_multiverse(grid, n_jobs=args.jobs)
+    os.makedirs(args.output_dir, exist_ok=True)
+    coefficients.to_csv(os.path.join(args.output_dir, 'coefficients.csv'), index=False)
+    specs_table.to_csv(os.path.join(args.output_dir, 'specifications.csv'), index=False)
+    plot_spec_curve(specs_table, os.path.join(args.output_dir, 'spec_curve.png'))
+
+    failed = specs_table['error'].notna().sum()
+    print(f"Fitted {len(specs_table) - failed} of {len(specs_table)} specifications "
+          f"({failed} could not be estimated); results in {args.output_dir}")
+    with pd.option_context('display.float_format', '{:,.6f}'.format, 'display.width', 160):
+        print(specs_table['effect'].describe())
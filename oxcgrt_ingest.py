@@ -0,0 +1,195 @@
+import argparse
+import re
+
+import numpy as np
+import pandas as pd
+
+from panel_data import province_table
+
+# --- Raw daily OxCGRT -> quarterly provincial stringency ---
+# The OxCGRT subnational files carry one row per jurisdiction per day for every
+# country and every indicator. This stage streams such a file in chunks, keeps
+# only the Chinese provinces (mapped to GbProv), and accumulates per
+# province-quarter sums, counts, maxima and days above thresholds in small
+# dense arrays, so memory does not grow with the size of the file.
+#
+# The result can be written in the same wide layout as
+# "China_COVID_measures_cost.xlsx - OxCGRT Stringency Index.csv" and fed to
+# panel_data.load_panel(paths={'stringency': ...}) as the Stringency_Index column.
+
+DEFAULT_VALUE_COL = 'StringencyIndex_Average'
+# Older OxCGRT releases name the index column differently.
+VALUE_COL_FALLBACKS = ('StringencyIndex_Average', 'StringencyIndex', 'StringencyIndex_Average_ForDisplay')
+
+# ISO 3166-2:CN subdivision suffixes (as in OxCGRT RegionCode, e.g. "CHN_BJ").
+ISO_CODES = {
+    11: 'BJ', 12: 'TJ', 13: 'HE', 14: 'SX', 15: 'NM', 21: 'LN', 22: 'JL', 23: 'HL',
+    31: 'SH', 32: 'JS', 33: 'ZJ', 34: 'AH', 35: 'FJ', 36: 'JX', 37: 'SD', 41: 'HA',
+    42: 'HB', 43: 'HN', 44: 'GD', 45: 'GX', 46: 'HI', 50: 'CQ', 51: 'SC', 52: 'GZ',
+    53: 'YN', 54: 'XZ', 61: 'SN', 62: 'GS', 63: 'QH', 64: 'NX', 65: 'XJ',
+}
+# OxCGRT RegionName spellings that differ from ProvEN.
+NAME_ALIASES = {
+    'Inner Mongolia': 'Neimenggu',
+    'Nei Mongol': 'Neimenggu',
+    'Tibet': 'Xizang',
+}
+
+
+def _normalise_name(name):
+    return re.sub(r'[^a-z]', '', str(name).lower())
+
+
+def region_lookup(provinces=None):
+    """Map normalised RegionName / RegionCode suffix -> position in `provinces`."""
+    provinces = province_table() if provinces is None else provinces
+    position = {int(gb): i for i, gb in enumerate(provinces['GbProv'])}
+    by_name = {_normalise_name(en): position[int(gb)] for gb, en in zip(provinces['GbProv'], provinces['ProvEN'])}
+    for alias, en in NAME_ALIASES.items():
+        if _normalise_name(en) in by_name:
+            by_name[_normalise_name(alias)] = by_name[_normalise_name(en)]
+    by_code = {iso: position[gb] for gb, iso in ISO_CODES.items() if gb in position}
+    return by_name, by_code
+
+
+class QuarterlyAccumulator:
+    """Running province x quarter sums, counts, maxima and threshold-day counts."""
+
+    def __init__(self, n_provinces, thresholds=()):
+        self.n_provinces = n_provinces
+        self.thresholds = tuple(thresholds)
+        self.first_quarter = None
+        self.sums = np.zeros((n_provinces, 0))
+        self.counts = np.zeros((n_provinces, 0), dtype=np.int64)
+        self.maxima = np.full((n_provinces, 0), -np.inf)
+        self.days_above = np.zeros((len(self.thresholds), n_provinces, 0), dtype=np.int64)
+
+    def _grow(self, q_min, q_max):
+        if self.first_quarter is None:
+            self.first_quarter = q_min
+        lead = max(self.first_quarter - q_min, 0)
+        trail = max(q_max - (self.first_quarter + self.sums.shape[1] - 1), 0)
+        if lead or trail:
+            pad = ((0, 0), (lead, trail))
+            self.sums = np.pad(self.sums, pad)
+            self.counts = np.pad(self.counts, pad)
+            self.maxima = np.pad(self.maxima, pad, constant_values=-np.inf)
+            self.days_above = np.pad(self.days_above, ((0, 0),) + pad)
+            self.first_quarter -= lead
+
+    def update(self, province_idx, quarter_idx, values):
+        """Add daily observations given as aligned integer/float arrays."""
+        keep = ~np.isnan(values)
+        province_idx, quarter_idx, values = province_idx[keep], quarter_idx[keep], values[keep]
+        if not len(values):
+            return
+        self._grow(int(quarter_idx.min()), int(quarter_idx.max()))
+        n_q = self.sums.shape[1]
+        flat = province_idx * n_q + (quarter_idx - self.first_quarter)
+        size = self.n_provinces * n_q
+        self.sums += np.bincount(flat, weights=values, minlength=size).reshape(self.n_provinces, n_q)
+        self.counts += np.bincount(flat, minlength=size).reshape(self.n_provinces, n_q)
+        np.maximum.at(self.maxima.reshape(-1), flat, values)
+        for i, threshold in enumerate(self.thresholds):
+            above = np.bincount(flat, weights=values >= threshold, minlength=size)
+            self.days_above[i] += above.astype(np.int64).reshape(self.n_provinces, n_q)
+
+    def quarter_labels(self):
+        quarters = self.first_quarter + np.arange(self.sums.shape[1])
+        return [f"{q // 4}Q{q % 4 + 1}" for q in quarters]
+
+
+def _chunk_indices(chunk, value_col, by_name, by_code):
+    province = chunk['RegionName'].map(lambda name: by_name.get(_normalise_name(name), -1))
+    if 'RegionCode' in chunk:
+        suffix = chunk['RegionCode'].astype(str).str.extract(r'[_-]([A-Z]{2})$', expand=False)
+        province = province.where(province >= 0, suffix.map(by_code).fillna(-1))
+    province = province.to_numpy(dtype=np.int64)
+
+    dates = chunk['Date'].to_numpy(dtype=np.int64)
+    year, month = dates // 10000, (dates // 100) % 100
+    quarter = year * 4 + (month - 1) // 3
+    values = pd.to_numeric(chunk[value_col], errors='coerce').to_numpy(dtype=np.float64)
+    keep = province >= 0
+    return province[keep], quarter[keep], values[keep]
+
+
+def ingest_oxcgrt(path, value_col=None, thresholds=(), chunksize=500_000, country='CHN', provinces=None):
+    """Stream a raw daily OxCGRT CSV into a long quarterly provincial panel.
+
+    Returns GbProv, ProvEN, Quarter and Stringency_Index (the quarterly mean
+    of the daily index), plus Stringency_max and Stringency_days_above_<t>
+    for each threshold t. Country-level rows (blank RegionName) and, where the
+    file has a Jurisdiction column, anything other than state totals are skipped.
+    """
+    provinces = province_table() if provinces is None else provinces
+    by_name, by_code = region_lookup(provinces)
+
+    header = pd.read_csv(path, nrows=0).columns
+    if value_col is None:
+        value_col = next((col for col in VALUE_COL_FALLBACKS if col in header), None)
+        if value_col is None:
+            raise ValueError(f"No stringency column found in {path}; pass value_col explicitly.")
+    usecols = [col for col in ('CountryCode', 'RegionName', 'RegionCode', 'Jurisdiction', 'Date', value_col)
+               if col in header]
+    dtypes = {col: 'string' for col in ('CountryCode', 'RegionName', 'RegionCode', 'Jurisdiction')}
+
+    acc = QuarterlyAccumulator(len(provinces), thresholds)
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize, low_memory=False):
+        mask = (chunk['CountryCode'] == country) & chunk['RegionName'].notna()
+        if 'Jurisdiction' in chunk:
+            mask &= chunk['Jurisdiction'].fillna('STATE_TOTAL') == 'STATE_TOTAL'
+        chunk = chunk[mask.fillna(False).to_numpy(dtype=bool)]
+        if len(chunk):
+            acc.update(*_chunk_indices(chunk, value_col, by_name, by_code))
+
+    if acc.first_quarter is None:
+        raise ValueError(f"No {country} provincial rows found in {path}.")
+    return _to_long(acc, provinces)
+
+
+def _to_long(acc, provinces):
+    labels = acc.quarter_labels()
+    n_p, n_q = acc.sums.shape
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = acc.sums / acc.counts
+    observed = acc.counts > 0
+    long = pd.DataFrame({
+        'GbProv': np.repeat(provinces['GbProv'].to_numpy(), n_q),
+        'ProvEN': np.repeat(provinces['ProvEN'].to_numpy(), n_q),
+        'Quarter': np.tile(labels, n_p),
+        'Stringency_Index': np.where(observed, means, np.nan).ravel(),
+        'Stringency_max': np.where(observed, acc.maxima, np.nan).ravel(),
+        'Stringency_days': acc.counts.ravel(),
+    })
+    for threshold, days in zip(acc.thresholds, acc.days_above):
+        long[f"Stringency_days_above_{threshold:g}"] = days.ravel()
+    return long
+
+
+def to_wide(long, value_col='Stringency_Index', provinces=None):
+    """Wide sheet layout (GbProv, ProvCH, ProvEN, one column per quarter)."""
+    provinces = province_table() if provinces is None else provinces
+    wide = long.pivot(index='GbProv', columns='Quarter', values=value_col)
+    wide.columns.name = None
+    return provinces.merge(wide, left_on='GbProv', right_index=True, how='left')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Aggregate a raw daily OxCGRT file to quarterly provincial stringency.")
+    parser.add_argument('raw_csv', help="raw daily OxCGRT subnational CSV (optionally compressed)")
+    parser.add_argument('--out', default='OxCGRT Stringency Index (quarterly, from daily).csv',
+                        help="wide CSV in the layout of the stringency sheet")
+    parser.add_argument('--long-out', help="optional long CSV with all aggregates")
+    parser.add_argument('--value-col', help=f"index column to aggregate (default: {DEFAULT_VALUE_COL})")
+    parser.add_argument('--threshold', type=float, action='append', default=[],
+                        help="count days at or above this stringency (repeatable)")
+    parser.add_argument('--chunksize', type=int, default=500_000)
+    args = parser.parse_args()
+
+    df_long = ingest_oxcgrt(args.raw_csv, value_col=args.value_col, thresholds=args.threshold,
+                            chunksize=args.chunksize)
+    to_wide(df_long).to_csv(args.out, index=False)
+    if args.long_out:
+        df_long.to_csv(args.long_out, index=False)
+    print(f"Wrote {df_long['GbProv'].nunique()} provinces x {df_long['Quarter'].nunique()} quarters to {args.out}")
@@ -0,0 +1,182 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- Dense array-backed panel ---
+# The long DataFrames of the scripts are melted, merged, filtered and
+# re-indexed over and over. PanelArray keeps the same data as one dense
+# (entity x time x variable) float array with a boolean mask of observed
+# values, plus small index tables for the entity, time and variable labels.
+# Lags, group means and fixed-effect demeaning become axis operations, and
+# the array can live in a memory-mapped .npy file for panels larger than RAM.
+
+
+class PanelArray:
+    def __init__(self, data, mask, entities, times, variables):
+        self.data = data
+        self.mask = mask
+        self.entities = pd.Index(entities)
+        self.times = pd.Index(times)
+        self.variables = list(variables)
+
+    # --- construction and conversion ---
+
+    @classmethod
+    def from_long(cls, df, variables=None, entity='GbProv', time='Time', memmap_dir=None):
+        """Build from a long frame with entity/time as columns or MultiIndex levels.
+
+        With `memmap_dir` the arrays are created as memory-mapped .npy files
+        in that directory (see save/open) instead of in memory.
+        """
+        if isinstance(df.index, pd.MultiIndex):
+            df = df.reset_index()
+        if variables is None:
+            variables = [col for col in df.columns
+                         if col not in (entity, time) and pd.api.types.is_numeric_dtype(df[col])]
+        variables = list(variables)
+        e_codes, entities = pd.factorize(df[entity], sort=True)
+        t_codes, times = pd.factorize(df[time], sort=True)
+        shape = (len(entities), len(times), len(variables))
+
+        if memmap_dir is None:
+            data = np.full(shape, np.nan)
+            mask = np.zeros(shape, dtype=bool)
+        else:
+            os.makedirs(memmap_dir, exist_ok=True)
+            data = np.lib.format.open_memmap(os.path.join(memmap_dir, 'data.npy'), mode='w+',
+                                             dtype=np.float64, shape=shape)
+            mask = np.lib.format.open_memmap(os.path.join(memmap_dir, 'mask.npy'), mode='w+',
+                                             dtype=bool, shape=shape)
+            data[:] = np.nan
+            mask[:] = False
+
+        values = df[variables].to_numpy(dtype=np.float64)
+        data[e_codes, t_codes, :] = values
+        mask[e_codes, t_codes, :] = ~np.isnan(values)
+        panel = cls(data, mask, entities, times, variables)
+        if memmap_dir is not None:
+            panel._write_index(memmap_dir)
+        return panel
+
+    def to_long(self, variables=None, dropna='all', entity='GbProv', time='Time'):
+        """Long frame indexed by (entity, time), the layout PanelOLS expects.
+
+        `dropna` drops entity-periods where 'all' (default) or 'any' of the
+        selected variables is missing; None keeps every cell.
+        """
+        variables = self.variables if variables is None else list(variables)
+        idx = [self.variables.index(v) for v in variables]
+        n, t = self.shape[:2]
+        frame = pd.DataFrame(self.data[:, :, idx].reshape(n * t, len(idx)), columns=variables,
+                             index=pd.MultiIndex.from_product([self.entities, self.times], names=[entity, time]))
+        if dropna is not None:
+            observed = self.mask[:, :, idx].reshape(n * t, len(idx))
+            keep = observed.any(axis=1) if dropna == 'all' else observed.all(axis=1)
+            frame = frame[keep]
+        return frame
+
+    def save(self, directory):
+        """Write data.npy, mask.npy and index.json to `directory`."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'data.npy'), np.asarray(self.data))
+        np.save(os.path.join(directory, 'mask.npy'), np.asarray(self.mask))
+        self._write_index(directory)
+
+    def _write_index(self, directory):
+        index = {'entities': self.entities.tolist(), 'times': self.times.tolist(), 'variables': self.variables}
+        with open(os.path.join(directory, 'index.json'), 'w') as f:
+            json.dump(index, f, default=lambda v: v.item() if hasattr(v, 'item') else str(v))
+
+    @classmethod
+    def open(cls, directory, mode='r'):
+        """Memory-map a panel written by save() or from_long(memmap_dir=...)."""
+        with open(os.path.join(directory, 'index.json')) as f:
+            index = json.load(f)
+        data = np.load(os.path.join(directory, 'data.npy'), mmap_mode=mode)
+        mask = np.load(os.path.join(directory, 'mask.npy'), mmap_mode=mode)
+        return cls(data, mask, index['entities'], index['times'], index['variables'])
+
+    # --- access ---
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def is_balanced(self):
+        return bool(self.mask.all())
+
+    def __getitem__(self, variable):
+        """(N, T) array of one variable, NaN where missing."""
+        return self.data[:, :, self.variables.index(variable)]
+
+    def with_variable(self, name, values):
+        """New PanelArray with an (N, T) array appended (or replaced) as `name`."""
+        values = np.asarray(values, dtype=np.float64)
+        if name in self.variables:
+            data, mask = np.array(self.data), np.array(self.mask)
+            j = self.variables.index(name)
+            data[:, :, j], mask[:, :, j] = values, ~np.isnan(values)
+            return PanelArray(data, mask, self.entities, self.times, self.variables)
+        data = np.concatenate([self.data, values[:, :, None]], axis=2)
+        mask = np.concatenate([self.mask, ~np.isnan(values)[:, :, None]], axis=2)
+        return PanelArray(data, mask, self.entities, self.times, self.variables + [name])
+
+    # --- axis operations ---
+
+    def lag(self, variable, k=1, fill=np.nan):
+        """Value of `variable` k periods earlier (k < 0 gives a lead), as (N, T).
+
+        Lags follow the time axis, so a period missing for an entity yields a
+        missing lag rather than silently borrowing an older value.
+        """
+        x = self[variable]
+        out = np.full_like(x, fill, dtype=np.float64)
+        if k > 0:
+            out[:, k:] = x[:, :-k]
+        elif k < 0:
+            out[:, :k] = x[:, -k:]
+        else:
+            out[:] = x
+        return out
+
+    def entity_means(self, variables=None):
+        """(N, k) means over time of the observed values."""
+        return self._masked_mean(variables, axis=1)
+
+    def time_means(self, variables=None):
+        """(T, k) cross-sectional means of the observed values."""
+        return self._masked_mean(variables, axis=0)
+
+    def _masked_mean(self, variables, axis):
+        idx = self._idx(variables)
+        m = self.mask[:, :, idx]
+        total = np.where(m, self.data[:, :, idx], 0.0).sum(axis=axis)
+        with np.errstate(invalid='ignore'):
+            return total / m.sum(axis=axis)
+
+    def _idx(self, variables):
+        return list(range(len(self.variables))) if variables is None else [self.variables.index(v) for v in variables]
+
+    def demean(self, variables=None, tol=1e-10, max_iter=1000):
+        """Two-way (entity and time) within transform as an (N, T, k) array.
+
+        Cells are restricted to entity-periods where every selected variable
+        is observed (the estimation sample). Entity and time means are removed
+        alternately until convergence; a balanced panel needs a single pass.
+        """
+        idx = self._idx(variables)
+        rows = self.mask[:, :, idx].all(axis=2)
+        x = np.where(rows[:, :, None], self.data[:, :, idx], 0.0)
+        w = rows[:, :, None].astype(np.float64)
+        n_e = np.maximum(w.sum(axis=1), 1)
+        n_t = np.maximum(w.sum(axis=0), 1)
+        for _ in range(max_iter):
+            before = x.copy()
+            x = (x - (x.sum(axis=1) / n_e)[:, None, :]) * w
+            x = (x - (x.sum(axis=0) / n_t)[None, :, :]) * w
+            if rows.all() or np.abs(x - before).max() <= tol * max(np.abs(before).max(), 1.0):
+                break
+        return np.where(rows[:, :, None], x, np.nan)
@@ -0,0 +1,223 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import record_inputs, stage
+
+# --- Source files ---
+# The three sheets of China_COVID_measures_cost.xlsx, exported as wide CSVs with
+# one row per province (GbProv, ProvCH, ProvEN) and one column per quarter.
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GRP_CSV = "China_COVID_measures_cost.xlsx - GRB (Real 2019 Billion RMB).csv"
+STRINGENCY_CSV = "China_COVID_measures_cost.xlsx - OxCGRT Stringency Index.csv"
+CASES_CSV = "China_COVID_measures_cost.xlsx - COVID-19 New Confirmed PC Cases.csv"
+
+# source name -> (file name, value column in the long panel)
+PANEL_SOURCES = {
+    'grp': (GRP_CSV, 'GRP_real'),
+    'stringency': (STRINGENCY_CSV, 'Stringency_Index'),
+    'cases': (CASES_CSV, 'Covid_Cases_per_mil'),
+}
+DEFAULT_SOURCES = ('grp', 'stringency', 'cases')
+
+PANEL_KEYS = ['GbProv', 'ProvEN', 'Quarter']
+
+# Time-invariant province characteristics (urbanization rate, ...), one row per
+# GbProv with one column per moderator. ProvEN is only there for readability.
+MODERATORS_CSV = "province_moderators.csv"
+
+CACHE_DIR = os.path.join(DATA_DIR, '.panel_cache')
+# Bump when the layout of the cached panel changes so old caches are not reused.
+CACHE_VERSION = 1
+
+
+def reshape_to_panel(df, value_name):
+    quarter_cols = [col for col in df.columns if 'Q' in col and col.startswith('20')]
+    df_long = df.melt(id_vars=['GbProv', 'ProvEN'], value_vars=quarter_cols, var_name='Quarter', value_name=value_name)
+    return df_long
+
+
+def source_path(name, paths=None):
+    """Absolute path of a panel source, honouring per-call overrides in `paths`."""
+    if paths and name in paths:
+        return os.path.abspath(paths[name])
+    return os.path.join(DATA_DIR, PANEL_SOURCES[name][0])
+
+
+def province_table(paths=None):
+    """GbProv, ProvCH, ProvEN for every province, in the row order of the GRP sheet."""
+    df = pd.read_csv(source_path('grp', paths), usecols=['GbProv', 'ProvCH', 'ProvEN'])
+    return df.astype({'GbProv': np.int16})
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """sha256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def frame_hash(df):
+    """sha256 of an in-memory frame's column names, index and values."""
+    digest = hashlib.sha256('|'.join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def source_hashes(sources=DEFAULT_SOURCES, paths=None):
+    return {name: file_hash(source_path(name, paths)) for name in sources}
+
+
+def panel_hash(sources=DEFAULT_SOURCES, paths=None, from_workbook=False):
+    """Key identifying a merged panel: the loader version plus each source's content hash."""
+    if from_workbook:
+        from workbook_loader import workbook_path
+        workbook_hash = file_hash(workbook_path(paths and paths.get('workbook')))
+        hashes = {name: workbook_hash for name in sources}
+    else:
+        hashes = source_hashes(sources, paths)
+    record_inputs(hashes)
+    digest = hashlib.sha256(f"v{CACHE_VERSION}|{'xlsx' if from_workbook else 'csv'}".encode())
+    for name in sources:
+        digest.update(f"|{name}={hashes[name]}".encode())
+    return digest.hexdigest()
+
+
+def build_panel(sources=DEFAULT_SOURCES, paths=None, from_workbook=False):
+    """Parse, reshape and merge the wide sources into one long panel (no panel cache).
+
+    With `from_workbook` the sheets are read straight from the .xlsx (see
+    workbook_loader; `paths` may then name it under 'workbook') instead of
+    the exported CSVs.
+    """
+    if from_workbook:
+        from workbook_loader import load_sheets
+        with stage('load', source='xlsx') as info:
+            sheets = load_sheets(paths and paths.get('workbook'), sources)
+            info['rows'] = {name: len(sheets[name].gbprov) for name in sources}
+        with stage('reshape') as info:
+            frames = [sheets[name].to_long(PANEL_SOURCES[name][1]) for name in sources]
+            info['rows'] = sum(len(df_long) for df_long in frames)
+    else:
+        with stage('load', source='csv') as info:
+            wide = [pd.read_csv(source_path(name, paths)) for name in sources]
+            info['rows'] = dict(zip(sources, map(len, wide)))
+        with stage('reshape') as info:
+            frames = []
+            for name, df_wide in zip(sources, wide):
+                df_long = reshape_to_panel(df_wide, PANEL_SOURCES[name][1])
+                df_long['Quarter'] = df_long['Quarter'].str.strip()
+                frames.append(df_long)
+            info['rows'] = sum(len(df_long) for df_long in frames)
+
+    with stage('merge') as info:
+        panel = frames[0]
+        for df_long in frames[1:]:
+            panel = pd.merge(panel, df_long, on=PANEL_KEYS)
+        info['rows'] = len(panel)
+
+    return _apply_panel_types(panel.reset_index(drop=True), sources)
+
+
+def _apply_panel_types(panel, sources):
+    # Typed columns: small-integer province codes and categorical keys, with the
+    # quarter categories kept in chronological order so cat.codes is a time index.
+    # Parquet stores the integer GbProv categorical as plain int16, so this also
+    # runs on panels read back from the cache.
+    panel['GbProv'] = panel['GbProv'].astype(np.int16).astype('category')
+    panel['ProvEN'] = panel['ProvEN'].astype('category')
+    quarters = panel['Quarter'].astype(str)
+    panel['Quarter'] = pd.Categorical(quarters, categories=sorted(quarters.unique()), ordered=True)
+    for name in sources:
+        value_col = PANEL_SOURCES[name][1]
+        panel[value_col] = panel[value_col].astype(np.float64)
+    return panel
+
+
+def _cache_file(key):
+    return os.path.join(CACHE_DIR, f"panel-{key[:24]}.parquet")
+
+
+def load_panel(sources=DEFAULT_SOURCES, paths=None, use_cache=True, from_workbook=False):
+    """Merged long panel (GbProv, ProvEN, Quarter + one column per source).
+
+    The panel is cached as Parquet under `.panel_cache/`, keyed on the content
+    hashes of the source files, so it is rebuilt only when one of them changes.
+    Without pyarrow the panel is simply rebuilt on every call. Set
+    `from_workbook` to read China_COVID_measures_cost.xlsx instead of the CSVs.
+    """
+    sources = tuple(sources)
+    if not use_cache:
+        return build_panel(sources, paths, from_workbook)
+
+    key = panel_hash(sources, paths, from_workbook)
+    cache_file = _cache_file(key)
+    if os.path.exists(cache_file):
+        try:
+            with stage('load', source='cache') as info:
+                panel = _apply_panel_types(pd.read_parquet(cache_file), sources)
+                info['rows'] = len(panel)
+            return panel
+        except ImportError:
+            return build_panel(sources, paths, from_workbook)
+
+    panel = build_panel(sources, paths, from_workbook)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        panel.to_parquet(tmp_file, index=False)
+        os.replace(tmp_file, cache_file)
+    except ImportError:
+        pass
+    return panel
+
+
+def clear_cache():
+    """Remove every cached panel and parsed workbook."""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith(('panel-', 'sheets-')):
+            os.remove(os.path.join(CACHE_DIR, name))
+
+
+def moderators_path(path=None):
+    return os.path.abspath(path) if path else os.path.join(DATA_DIR, MODERATORS_CSV)
+
+
+def load_moderators(columns=None, path=None):
+    """Province moderators indexed by GbProv (all columns, or just `columns`)."""
+    df = pd.read_csv(moderators_path(path)).astype({'GbProv': np.int16}).set_index('GbProv')
+    df = df.drop(columns='ProvEN', errors='ignore')
+    if columns is not None:
+        missing = [col for col in columns if col not in df.columns]
+        if missing:
+            raise KeyError(f"Moderators not in {MODERATORS_CSV}: {', '.join(missing)}")
+        df = df[list(columns)]
+    return df.astype(np.float64)
+
+
+def add_moderators(df_panel, columns, path=None):
+    """Copy of the panel with moderator columns matched on GbProv (NaN where missing)."""
+    moderators = load_moderators(columns, path)
+    gbprov = df_panel['GbProv'].astype(np.int16)
+    return df_panel.assign(**{col: gbprov.map(moderators[col]).to_numpy(dtype=np.float64) for col in moderators})
+
+
+def add_model_variables(df_panel):
+    """Regression variables shared by the TWFE scripts.
+
+    Drops non-positive GRP, adds log_GRP, Covid_Cases (cases per person) and a
+    numeric Time index from the chronologically ordered Quarter.
+    """
+    df_panel = df_panel[df_panel['GRP_real'] > 0].copy()
+    df_panel['log_GRP'] = np.log(df_panel['GRP_real'])
+    if 'Covid_Cases_per_mil' in df_panel:
+        df_panel['Covid_Cases'] = df_panel['Covid_Cases_per_mil'] / 1_000_000
+    df_panel['Time'] = df_panel['Quarter'].cat.remove_unused_categories().cat.codes
+    return df_panel
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# --- Policy cost and its uncertainty ---
+# With log(GRP) = ... + sum_k beta_k * z_k, where the z_k are the policy terms
+# (Stringency_Index, its lags, its interactions), the no-policy counterfactual
+# is GRP_cf = GRP_actual * exp(-eta) with eta = Z @ beta, and the policy cost of
+# an observation is GRP_cf - GRP_actual.
+#
+# Uncertainty in beta is carried through two ways:
+#   * delta method: gradient of the (total or group) cost w.r.t. beta, one
+#     matrix product, normal intervals;
+#   * simulation: beta draws ~ N(beta_hat, V) evaluated as a (draws x obs)
+#     array, in chunks so that memory stays bounded for large panels.
+
+DEFAULT_MAX_ELEMENTS = 20_000_000  # ~160 MB of float64 per (draws x obs) chunk
+
+
+def policy_cost(grp, z, beta):
+    """Per-observation cost GRP_actual * (exp(-z @ beta) - 1)."""
+    grp = np.asarray(grp, dtype=np.float64)
+    eta = np.asarray(z, dtype=np.float64) @ np.asarray(beta, dtype=np.float64)
+    return grp * np.expm1(-eta)
+
+
+def group_indicator(*code_arrays):
+    """Sparse (obs x groups) 0/1 matrix stacking one or more groupings side by side.
+
+    Each argument is an array of integer group codes per observation; the
+    groups of later arrays are numbered after those of earlier ones.
+    """
+    from scipy import sparse
+    rows, cols, offset = [], [], 0
+    for codes in code_arrays:
+        codes = np.asarray(codes, dtype=np.intp)
+        rows.append(np.arange(len(codes)))
+        cols.append(codes + offset)
+        offset += int(codes.max()) + 1 if len(codes) else 0
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(code_arrays[0]), offset))
+
+
+def cost_delta_method(grp, z, beta, cov, groups=None):
+    """Point cost and delta-method standard error for the total, or per group.
+
+    `groups` is an (obs x groups) indicator from group_indicator; without it a
+    single total is returned.
+    """
+    grp = np.asarray(grp, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    beta = np.asarray(beta, dtype=np.float64)
+    cost = policy_cost(grp, z, beta)
+    # d cost_i / d beta = -GRP_cf_i * z_i
+    grad_obs = -(grp * np.exp(-(z @ beta)))[:, None] * z
+    if groups is None:
+        point, grad = np.atleast_1d(cost.sum()), grad_obs.sum(axis=0)[None, :]
+    else:
+        point, grad = groups.T @ cost, groups.T @ grad_obs
+    se = np.sqrt(np.einsum('gk,kl,gl->g', grad, np.asarray(cov, dtype=np.float64), grad))
+    return point, se
+
+
+def cost_for_params(grp, z, betas, groups=None, max_elements=DEFAULT_MAX_ELEMENTS):
+    """Total (or grouped) cost for each row of `betas`: shape (n,) or (n, groups).
+
+    Rows are processed in chunks of at most `max_elements` // n_obs, so the
+    (chunk x obs) cost array never exceeds `max_elements` entries.
+    """
+    grp = np.asarray(grp, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    betas = np.atleast_2d(np.asarray(betas, dtype=np.float64))
+    n = len(betas)
+    chunk = max(1, max_elements // max(len(grp), 1))
+    out = np.empty(n) if groups is None else np.empty((n, groups.shape[1]))
+    for start in range(0, n, chunk):
+        cost = grp * np.expm1(-(betas[start:start + chunk] @ z.T))
+        if groups is None:
+            out[start:start + chunk] = cost.sum(axis=1)
+        else:
+            out[start:start + chunk] = (groups.T @ cost.T).T
+    return out
+
+
+def simulate_cost(grp, z, beta, cov, draws=10_000, seed=None, groups=None, max_elements=DEFAULT_MAX_ELEMENTS):
+    """Simulated costs for beta ~ N(beta, cov): shape (draws,) or (draws, groups)."""
+    rng = np.random.default_rng(seed)
+    beta_draws = rng.multivariate_normal(np.asarray(beta, dtype=np.float64),
+                                         np.asarray(cov, dtype=np.float64), size=draws)
+    return cost_for_params(grp, z, beta_draws, groups, max_elements)
+
+
+def cost_intervals(df, params, cov, terms, grp_col='GRP_real_actual', by=('ProvEN', 'Quarter'),
+                   draws=10_000, level=0.95, seed=None, max_elements=DEFAULT_MAX_ELEMENTS):
+    """Total and grouped policy cost with delta-method and simulated intervals.
+
+    `params` and `cov` are the coefficient Series and covariance DataFrame of a
+    TWFE fit (fit_twfe or PanelOLS results); `terms` names the policy terms,
+    which must be both columns of `df` and entries of `params`. Returns a
+    DataFrame indexed by (level, group): the 'Total' row first, then one block
+    per column in `by`. All groupings share a single pass over the draws.
+    """
+    terms = list(terms)
+    grp = df[grp_col].to_numpy(dtype=np.float64)
+    z = df[terms].to_numpy(dtype=np.float64)
+    beta = np.asarray(params[terms], dtype=np.float64)
+    v = np.asarray(pd.DataFrame(cov).loc[terms, terms], dtype=np.float64)
+
+    code_arrays = [np.zeros(len(df), dtype=np.intp)]
+    index = [('Total', 'All')]
+    for col in by:
+        codes, labels = pd.factorize(df[col], sort=True)
+        code_arrays.append(codes)
+        index += [(col, str(label)) for label in labels]
+    groups = group_indicator(*code_arrays)
+
+    point, se = cost_delta_method(grp, z, beta, v, groups)
+    sims = simulate_cost(grp, z, beta, v, draws=draws, seed=seed, groups=groups, max_elements=max_elements)
+    q = stats.norm.ppf((1 + level) / 2)
+    alpha = (1 - level) / 2
+    return pd.DataFrame({
+        'cost': point,
+        'delta_se': se,
+        'delta_lower': point - q * se,
+        'delta_upper': point + q * se,
+        'sim_mean': sims.mean(axis=0),
+        'sim_lower': np.quantile(sims, alpha, axis=0),
+        'sim_upper': np.quantile(sims, 1 - alpha, axis=0),
+    }, index=pd.MultiIndex.from_tuples(index, names=['level', 'group']))
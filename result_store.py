@@ -0,0 +1,151 @@
+import datetime
+import hashlib
+import json
+import os
+
+# --- Persistent store of fitted models ---
+# Each fit of a spec (specs.py) is saved as one JSON file under results/store/,
+# named by a key that hashes the full spec, the moderator values it uses, the
+# input data hash (panel_data.panel_hash) and STORE_VERSION. Re-running an
+# unchanged spec on unchanged data reads the stored params, covariance, nobs
+# and diagnostics back instead of refitting; editing a CSV or the spec gives a
+# new key. numpy, pandas and the estimator are only imported when a result is
+# rebuilt or fitted, so listing the store stays cheap.
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'store')
+# Bump when the stored layout or the estimator changes so old entries are ignored.
+STORE_VERSION = 2
+
+
+def store_key(spec, data_hash):
+    from specs import get_spec, moderator_hash
+    full = get_spec(spec)
+    payload = json.dumps({'spec': full, 'moderator': moderator_hash(full), 'data': data_hash,
+                          'version': STORE_VERSION}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _entry_path(key, store_dir):
+    return os.path.join(store_dir, f"{key[:24]}.json")
+
+
+def save_result(key, name, spec, data_hash, results, store_dir=STORE_DIR):
+    """Write a TWFEResults (params, cov, nobs, diagnostics) under `key`."""
+    exog = list(results.params.index)
+    record = {
+        'key': key,
+        'name': name,
+        'spec': spec,
+        'data_hash': data_hash,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'exog': exog,
+        'params': [float(v) for v in results.params],
+        'cov': [[float(v) for v in row] for row in results.cov.to_numpy()],
+        'nobs': int(results.nobs),
+        'df_resid': int(results.df_resid),
+        'df_absorbed': int(results.df_absorbed),
+        'cov_type': results.cov_type,
+        'n_entities': int(results.n_entities),
+        'n_periods': int(results.n_periods),
+        'diagnostics': {
+            'rsquared_within': None if results.resid is None else float(results.rsquared_within),
+            'iterations': int(results.iterations),
+            'converged': bool(results.converged),
+        },
+    }
+    os.makedirs(store_dir, exist_ok=True)
+    path = _entry_path(key, store_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(record, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_record(key, store_dir=STORE_DIR):
+    """Stored JSON record for `key`, or None."""
+    path = _entry_path(key, store_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        record = json.load(f)
+    return record if record.get('key') == key else None
+
+
+def results_from_record(record):
+    """Rebuild a TWFEResults (without per-observation arrays) from a record."""
+    import pandas as pd
+
+    from twfe_engine import TWFEResults
+    exog = record['exog']
+    diagnostics = record['diagnostics']
+    return TWFEResults(
+        params=pd.Series(record['params'], index=exog, name='parameter'),
+        cov=pd.DataFrame(record['cov'], index=exog, columns=exog),
+        nobs=record['nobs'],
+        df_resid=record['df_resid'],
+        df_absorbed=record['df_absorbed'],
+        cov_type=record['cov_type'],
+        entity_codes=None, time_codes=None, clusters=None,
+        x=None, y=None, resid=None,
+        n_entities=record['n_entities'],
+        n_periods=record['n_periods'],
+        iterations=diagnostics['iterations'],
+        converged=diagnostics['converged'],
+    )
+
+
+def fit_spec(spec, refit=False, panel=None, store_dir=STORE_DIR):
+    """Results of a spec (name in specs.SPECS or dict), from the store when possible.
+
+    On a miss (or with `refit`) the spec is fitted with fit_twfe (fit_twfe_slopes
+    for specs with entity slopes) and saved. A given `panel` is keyed by its
+    contents, so fits on subsets or edited panels never stand in for the
+    panel read from the CSVs.
+    Stored results carry no x/y/resid arrays; refit where those are needed.
+    """
+    from panel_data import frame_hash, panel_hash
+    from specs import build_frame, get_spec
+
+    name = spec if isinstance(spec, str) else 'custom'
+    full = get_spec(spec)
+    # A caller-supplied panel is keyed on its own contents, not on the CSVs.
+    data_hash = panel_hash(tuple(full['sources'])) if panel is None else f"frame:{frame_hash(panel)}"
+    key = store_key(full, data_hash)
+    if not refit:
+        record = load_record(key, store_dir)
+        if record is not None:
+            return results_from_record(record)
+
+    df = build_frame(full, panel)
+    if full['slopes']:
+        from sparse_twfe import fit_twfe_slopes
+        results = fit_twfe_slopes(df, full['dependent'], full['exog'], slopes=full['slopes'],
+                                  cov_type=full['cov_type'])
+    else:
+        from twfe_engine import fit_twfe
+        results = fit_twfe(df, full['dependent'], full['exog'], cov_type=full['cov_type'])
+    save_result(key, name, full, data_hash, results, store_dir)
+    return results
+
+
+def list_results(store_dir=STORE_DIR):
+    """Summary (name, key, created, nobs, data hash) of every stored result."""
+    if not os.path.isdir(store_dir):
+        return []
+    entries = []
+    for file_name in sorted(os.listdir(store_dir)):
+        if not file_name.endswith('.json'):
+            continue
+        with open(os.path.join(store_dir, file_name)) as f:
+            record = json.load(f)
+        entries.append({key: record[key] for key in ('name', 'key', 'created', 'nobs', 'data_hash')})
+    return entries
+
+
+def clear_store(store_dir=STORE_DIR):
+    if not os.path.isdir(store_dir):
+        return
+    for file_name in os.listdir(store_dir):
+        if file_name.endswith('.json'):
+            os.remove(os.path.join(store_dir, file_name))
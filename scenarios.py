@@ -0,0 +1,213 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from lags import interaction_name, lag_name, moderator_list
+from policy_cost import DEFAULT_MAX_ELEMENTS
+
+# --- Counterfactual stringency scenarios ---
+# A scenario is an alternative (province x quarter) stringency path. With the
+# fitted model
+#     log GRP_it = ... + sum_k (beta_k + gamma_k U_i) S_i,t-k
+# (k = 0..L lags, gamma_k the moderator interactions when the spec has them;
+# with several moderators each adds its own gamma_k U_i term; beta_k is
+# province-specific for specs with stringency slopes), replacing S by a
+# scenario path S* moves log GRP by
+#     eta_it = sum_k (beta_k + gamma_k U_i) (S*_i,t-k - S_i,t-k),
+# so GRP* = GRP_actual * exp(eta). Quarters before the panel contribute no
+# difference. A batch of B scenarios is a (B, N, T) array; the lag sums are
+# shifted slices of it, and only per-scenario aggregates are kept, so any
+# number of scenarios streams through in batches of bounded size.
+#
+# Scenario builders take the engine's actual paths and return named (N, T)
+# paths; see zero(), cap(), shift(), copy_province() and scale().
+
+
+class ScenarioEngine:
+    def __init__(self, grp, stringency, entities, quarters, weights):
+        self.grp = np.asarray(grp, dtype=np.float64)                # (N, T), NaN where missing
+        self.stringency = np.asarray(stringency, dtype=np.float64)  # (N, T) actual paths
+        self.entities = pd.Index(entities)
+        self.quarters = pd.Index(quarters)
+        self.weights = np.asarray(weights, dtype=np.float64)        # (L+1, N) per-lag effects
+        self._observed = ~np.isnan(self.grp)
+        self._grp0 = np.where(self._observed, self.grp, 0.0)
+        self._zero_grp = self._scenario_grp(np.zeros((1,) + self.shape))[0]
+
+    @classmethod
+    def from_spec(cls, spec='twfe', results=None, panel=None):
+        """Engine for a spec of specs.py, with coefficients from the result store.
+
+        `panel` defaults to the GRP and stringency panel that cost_estimation.py
+        prices (every quarter with both).
+        """
+        from panel_data import load_moderators
+        from result_store import fit_spec
+        from sparse_twfe import slope_name
+        from specs import get_spec
+
+        full = get_spec(spec)
+        results = fit_spec(spec) if results is None else results
+        if panel is None:
+            from panel_data import load_panel
+            panel = load_panel(sources=('grp', 'stringency'))
+        grp = panel.pivot_table(index='ProvEN', columns='Quarter', values='GRP_real', observed=True, dropna=False)
+        stringency = panel.pivot_table(index='ProvEN', columns='Quarter', values='Stringency_Index', observed=True,
+                                       dropna=False).reindex(index=grp.index, columns=grp.columns)
+
+        params = results.params
+        moderators = moderator_list(full['moderator'])
+        gbprov = panel.groupby('ProvEN', observed=True)['GbProv'].first().astype(np.int16).reindex(grp.index)
+        values = load_moderators(moderators).reindex(gbprov.to_numpy()) if moderators else None
+        weights = np.zeros((full['lags'] + 1, len(grp.index)))
+        for k in range(full['lags'] + 1):
+            term = lag_name('Stringency_Index', k)
+            if term in full['slopes']:
+                weights[k] = params.reindex([slope_name(term, g) for g in gbprov]).fillna(0.0).to_numpy()
+            else:
+                weights[k] = params.get(term, 0.0)
+            for mod in moderators:
+                term = interaction_name('Stringency_Index', k, mod)
+                if term in params:
+                    weights[k] += params[term] * values[mod].to_numpy()
+        return cls(grp.to_numpy(), stringency.to_numpy(), grp.index.astype(str), grp.columns.astype(str), weights)
+
+    @property
+    def shape(self):
+        return self.stringency.shape
+
+    def effect(self, paths):
+        """eta for a (B, N, T) batch of scenario paths, shape (B, N, T)."""
+        diff = np.nan_to_num(paths - self.stringency)
+        eta = self.weights[0][None, :, None] * diff
+        for k in range(1, len(self.weights)):
+            eta[:, :, k:] += self.weights[k][None, :, None] * diff[:, :, :-k]
+        return eta
+
+    def _scenario_grp(self, paths):
+        return self._grp0 * np.exp(self.effect(paths))
+
+    def counterfactual(self, path):
+        """(N, T) GRP under one scenario path, NaN where actual GRP is missing."""
+        grp = self._scenario_grp(np.asarray(path, dtype=np.float64)[None])[0]
+        return np.where(self._observed, grp, np.nan)
+
+    def evaluate(self, scenarios, by=('province', 'quarter'), max_elements=DEFAULT_MAX_ELEMENTS):
+        """Aggregate counterfactual GRP for an iterable of (name, (N, T) path) pairs.
+
+        Scenarios are consumed lazily in batches of at most `max_elements`
+        cells. Returns a dict of frames: 'total' (one row per scenario with
+        total GRP, the change from actual GRP and the policy cost relative to
+        zero stringency) plus, for each entry of `by`, the change from actual
+        GRP per scenario and province or quarter.
+        """
+        batch = max(1, max_elements // int(np.prod(self.shape)))
+        names, totals = [], []
+        grouped = {key: [] for key in by}
+        actual_total = self._grp0.sum()
+        zero_total = self._zero_grp.sum()
+        for batch_names, paths in _batches(scenarios, batch, self.shape):
+            grp = self._scenario_grp(paths)
+            change = grp - self._grp0
+            names += batch_names
+            total = grp.sum(axis=(1, 2))
+            totals.append(np.column_stack([total, total - actual_total, zero_total - total]))
+            if 'province' in grouped:
+                grouped['province'].append(change.sum(axis=2))
+            if 'quarter' in grouped:
+                grouped['quarter'].append(change.sum(axis=1))
+
+        index = pd.Index(names, name='scenario')
+        out = {'total': pd.DataFrame(np.vstack(totals), index=index, columns=['grp', 'change', 'cost'])}
+        labels = {'province': self.entities, 'quarter': self.quarters}
+        for key, parts in grouped.items():
+            out[key] = pd.DataFrame(np.vstack(parts), index=index, columns=labels[key])
+        return out
+
+
+def _batches(scenarios, size, shape):
+    names, paths = [], []
+    for name, path in scenarios:
+        path = np.asarray(path, dtype=np.float64)
+        if path.shape != shape:
+            raise ValueError(f"Scenario '{name}' has shape {path.shape}, expected {shape}.")
+        names.append(name)
+        paths.append(path)
+        if len(paths) == size:
+            yield names, np.stack(paths)
+            names, paths = [], []
+    if paths:
+        yield names, np.stack(paths)
+
+
+# --- scenario builders ---
+
+def zero(engine):
+    """No restrictions anywhere: the counterfactual of cost_estimation.py."""
+    yield 'zero', np.zeros(engine.shape)
+
+
+def cap(engine, limits):
+    """Stringency capped at each of `limits`."""
+    for limit in limits:
+        yield f'cap_{limit:g}', np.minimum(engine.stringency, limit)
+
+
+def scale(engine, factors):
+    """Stringency multiplied by each of `factors`."""
+    for factor in factors:
+        yield f'scale_{factor:g}', engine.stringency * factor
+
+
+def shift(engine, start, quarters=(1,)):
+    """Policy from `start` (e.g. '2022Q1') onwards delayed by each number of quarters.
+
+    Until the delayed path arrives, stringency stays at its level of the
+    quarter before `start`.
+    """
+    t0 = engine.quarters.get_loc(start)
+    for q in quarters:
+        path = engine.stringency.copy()
+        hold = engine.stringency[:, max(t0 - 1, 0)]
+        for t in range(t0, engine.shape[1]):
+            path[:, t] = hold if t - q < t0 else engine.stringency[:, t - q]
+        yield f'shift_{start}_{q:+d}', path
+
+
+def copy_province(engine, sources=None):
+    """Every province given the stringency path of each source province in turn."""
+    sources = engine.entities if sources is None else sources
+    for source in sources:
+        row = engine.stringency[engine.entities.get_loc(source)]
+        yield f'copy_{source}', np.broadcast_to(row, engine.shape)
+
+
+def main(argv=None):
+    """Evaluate the default scenario set for a spec and print the totals."""
+    import itertools
+
+    parser = argparse.ArgumentParser(description="Counterfactual GRP under alternative stringency paths.")
+    parser.add_argument('--spec', default='twfe', help="model spec (see specs.py)")
+    args = parser.parse_args(argv)
+
+    engine = ScenarioEngine.from_spec(args.spec)
+    scenarios = itertools.chain(
+        zero(engine),
+        cap(engine, range(20, 100, 10)),
+        shift(engine, '2022Q1', quarters=(1, 2)),
+        copy_province(engine),
+    )
+    out = engine.evaluate(scenarios)
+    print("==============================================================================")
+    print(f"   Counterfactual Stringency Scenarios ({args.spec})")
+    print("==============================================================================")
+    print("change: total GRP minus actual GRP; cost: GRP lost relative to zero stringency")
+    print("(Billion 2019 RMB)")
+    with pd.option_context('display.float_format', '{:,.2f}'.format, 'display.max_rows', None):
+        print(out['total'])
+    return out
+
+
+if __name__ == '__main__':
+    main()
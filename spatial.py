@@ -0,0 +1,205 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from panel_data import DATA_DIR
+from twfe_engine import factorize
+
+# --- Spatial weights, spatial lags and Conley standard errors ---
+# Provinces are linked either by contiguity (province_adjacency.csv, an edge
+# list of GbProv pairs; Hainan is joined to Guangdong by a 'sea' link so no
+# province is isolated) or by distance between capitals
+# (province_capitals.csv), with weights decaying with great-circle distance
+# and cut to zero beyond a cutoff. Either way W is a scipy.sparse (N x N)
+# matrix in the order of a given list of GbProv codes, and neighbour pairs are
+# found with a KD-tree, so nothing is ever O(N^2) at county scale.
+#
+# spatial_lag() adds W-weighted averages of neighbours' values in the same
+# quarter (W_Stringency_Index, W_Covid_Cases) as extra regressors.
+# conley_covariance() gives Conley spatial-HAC standard errors for a fit_twfe
+# result: scores of observations in the same quarter are correlated with a
+# kernel in capital-to-capital distance, optionally together with Bartlett
+# serial correlation within a province.
+
+ADJACENCY_CSV = "province_adjacency.csv"
+CAPITALS_CSV = "province_capitals.csv"
+EARTH_RADIUS_KM = 6371.0
+
+
+def _path(name, path):
+    return os.path.abspath(path) if path else os.path.join(DATA_DIR, name)
+
+
+def load_coordinates(path=None):
+    """Capital latitude/longitude in degrees, indexed by GbProv."""
+    df = pd.read_csv(_path(CAPITALS_CSV, path))
+    return df.astype({'GbProv': np.int64}).set_index('GbProv')[['Latitude', 'Longitude']]
+
+
+def row_standardize(w):
+    """Rows scaled to sum to one (rows without neighbours stay zero)."""
+    w = sparse.csr_matrix(w, dtype=np.float64)
+    sums = np.asarray(w.sum(axis=1)).ravel()
+    inv = np.divide(1.0, sums, out=np.zeros_like(sums), where=sums > 0)
+    return sparse.diags(inv) @ w
+
+
+def contiguity_weights(entities, path=None, standardize=True):
+    """Sparse contiguity matrix for the GbProv codes in `entities` (in that order)."""
+    edges = pd.read_csv(_path(ADJACENCY_CSV, path))
+    pos = pd.Series(np.arange(len(entities)), index=np.asarray(entities, dtype=np.int64))
+    a = pos.reindex(edges['GbProv_a'].to_numpy()).to_numpy()
+    b = pos.reindex(edges['GbProv_b'].to_numpy()).to_numpy()
+    keep = ~(np.isnan(a) | np.isnan(b))
+    a, b = a[keep].astype(np.intp), b[keep].astype(np.intp)
+    n = len(entities)
+    w = sparse.csr_matrix((np.ones(2 * len(a)), (np.r_[a, b], np.r_[b, a])), shape=(n, n))
+    w.data[:] = 1.0  # duplicate edges count once
+    return row_standardize(w) if standardize else w
+
+
+def _unit_vectors(coords):
+    lat, lon = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def distance_matrix(coords, cutoff_km):
+    """Sparse great-circle distances (km) between all pairs closer than `cutoff_km`.
+
+    Pairs are found on the unit sphere with a KD-tree on chord length; the
+    diagonal is not stored.
+    """
+    from scipy.spatial import cKDTree
+    xyz = _unit_vectors(np.asarray(coords, dtype=np.float64))
+    tree = cKDTree(xyz)
+    chord_cutoff = 2 * np.sin(min(cutoff_km / EARTH_RADIUS_KM, np.pi) / 2)
+    pairs = tree.sparse_distance_matrix(tree, chord_cutoff, output_type='coo_matrix')
+    keep = pairs.row != pairs.col
+    km = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(pairs.data[keep] / 2, 0, 1))
+    n = len(xyz)
+    return sparse.csr_matrix((km, (pairs.row[keep], pairs.col[keep])), shape=(n, n))
+
+
+def kernel_weights(distances, cutoff_km, kernel='bartlett'):
+    """Apply a distance kernel to the stored entries of a sparse distance matrix."""
+    k = distances.copy()
+    if kernel == 'bartlett':
+        k.data = 1 - k.data / cutoff_km
+    elif kernel == 'uniform':
+        k.data = np.ones_like(k.data)
+    elif kernel == 'inverse':
+        k.data = 1 / np.maximum(k.data, 1e-9)
+    elif kernel == 'exponential':
+        k.data = np.exp(-3 * k.data / cutoff_km)
+    else:
+        raise ValueError(f"Unknown kernel '{kernel}'.")
+    k.eliminate_zeros()
+    return k
+
+
+def _coordinates(entities, path=None):
+    coords = load_coordinates(path).reindex(np.asarray(entities, dtype=np.int64))
+    if coords.isna().any().any():
+        missing = coords.index[coords.isna().any(axis=1)].tolist()
+        raise KeyError(f"No coordinates for GbProv {missing}")
+    return coords.to_numpy()
+
+
+def distance_weights(entities, cutoff_km=600, decay='inverse', path=None, standardize=True):
+    """Distance-decay weights between capitals within `cutoff_km`.
+
+    `decay` is any kernel of kernel_weights ('inverse', 'exponential',
+    'bartlett', 'uniform').
+    """
+    coords = _coordinates(entities, path)
+    w = kernel_weights(distance_matrix(coords, cutoff_km), cutoff_km, decay)
+    return row_standardize(w) if standardize else w
+
+
+def spatial_lag(df, variables, weights, entities, entity='GbProv', time='Time', prefix='W_'):
+    """Copy of `df` with W-weighted neighbour averages of `variables` per period.
+
+    `weights` is an (N x N) sparse matrix over `entities`. Neighbours with a
+    missing value are left out and the remaining weights of the row rescaled,
+    so a row-standardized W still gives an average.
+    """
+    out = df.reset_index() if isinstance(df.index, pd.MultiIndex) else df.copy()
+    pos = pd.Series(np.arange(len(entities)), index=np.asarray(entities, dtype=np.int64))
+    e_codes = pos.reindex(out[entity].astype(np.int64).to_numpy()).to_numpy()
+    if np.isnan(e_codes).any():
+        raise KeyError("Some entities of the panel are not in the weight matrix.")
+    e_codes = e_codes.astype(np.intp)
+    t_codes, n_periods = factorize(out[time])
+    n = len(entities)
+    w = sparse.csr_matrix(weights)
+
+    for var in variables:
+        grid = np.full((n, n_periods), np.nan)
+        grid[e_codes, t_codes] = out[var].to_numpy(dtype=np.float64)
+        observed = ~np.isnan(grid)
+        total = w @ np.where(observed, grid, 0.0)
+        mass = w @ observed.astype(np.float64)
+        row_mass = np.asarray(w.sum(axis=1)).ravel()[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            lagged = np.where(mass > 0, total * row_mass / mass, np.nan)
+        out[prefix + var] = lagged[e_codes, t_codes]
+    return out
+
+
+def conley_covariance(results, entity_labels, cutoff_km=500, kernel='bartlett', time_lags=0, path=None):
+    """Conley spatial-HAC covariance of a fit_twfe result.
+
+    `entity_labels` are the GbProv codes behind results.entity_codes (the
+    sorted entities of the estimation sample). Scores of two provinces in
+    the same quarter are weighted by `kernel` in capital distance (1 for the
+    same province, 0 beyond `cutoff_km`). With `time_lags` > 0, scores of the
+    same province up to that many quarters apart are added with Bartlett
+    weights 1 - l / (time_lags + 1). Uses the result's cached scores and the
+    PanelOLS small-sample scale.
+    """
+    nobs, k = results.scores.shape
+    n, t = results.n_entities, results.n_periods
+    coords = _coordinates(entity_labels, path)
+    kern = kernel_weights(distance_matrix(coords, cutoff_km), cutoff_km, kernel) + sparse.identity(n, format='csr')
+
+    # Scores on an (N, T, k) grid, zero where an entity-period is missing.
+    scores = np.zeros((n, t, k))
+    scores[results.entity_codes, results.time_codes] = results.scores
+    spatial = kern @ scores.reshape(n, t * k)
+    meat = np.einsum('itk,itl->kl', scores, spatial.reshape(n, t, k))
+    for lag in range(1, time_lags + 1):
+        cross = np.einsum('itk,itl->kl', scores[:, lag:], scores[:, :-lag])
+        meat += (1 - lag / (time_lags + 1)) * (cross + cross.T)
+
+    scale = nobs / (nobs - results.df_absorbed - k)
+    cov = results.bread @ meat @ results.bread * scale
+    cov = (cov + cov.T) / 2
+    names = results.params.index
+    return pd.DataFrame(cov, index=names, columns=names)
+
+
+if __name__ == '__main__':
+    from panel_data import add_model_variables, load_panel
+    from twfe_engine import fit_twfe
+
+    df_panel = add_model_variables(load_panel())
+    entities = np.sort(df_panel['GbProv'].astype(np.int64).unique())
+    w = contiguity_weights(entities)
+    df_panel = spatial_lag(df_panel, ['Stringency_Index', 'Covid_Cases'], w, entities)
+
+    exog = ['Stringency_Index', 'W_Stringency_Index', 'Covid_Cases', 'W_Covid_Cases']
+    results = fit_twfe(df_panel, 'log_GRP', exog)
+    table = pd.DataFrame({'Parameter': results.params, 'Clustered SE': results.std_errors})
+    for cutoff in (500, 1000):
+        cov = conley_covariance(results, entities, cutoff_km=cutoff, time_lags=1)
+        table[f'Conley SE ({cutoff} km)'] = np.sqrt(np.diag(cov))
+
+    print("==============================================================================")
+    print("   TWFE with Spatially Lagged Stringency and Cases (contiguity weights)")
+    print("==============================================================================")
+    print(f"Observations: {results.nobs}    Provinces: {results.n_entities}    Neighbour links: {w.nnz // 2}")
+    print("------------------------------------------------------------------------------")
+    print(table.to_string(float_format=lambda v: f"{v:.6g}"))
+    print("==============================================================================")
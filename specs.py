@@ -0,0 +1,104 @@
+# --- Model specifications ---
+# The TWFE models of the scripts, described as data so they can be fitted,
+# cached (result_store.py) and compared without running the scripts. Every
+# spec regresses `dependent` on `exog` with province and quarter effects and
+# province-clustered errors unless it sets `cov_type`; `lags`/`edge` are passed to lags.add_lags for the
+# `lag_variables`, and `moderator` (one column of province_moderators.csv or a
+# list of them) and `interact` build the moderator interactions. Variables in
+# `slopes` get one coefficient per province (sparse_twfe.fit_twfe_slopes)
+# instead of a common one.
+#
+# twfe_urbanisation_interaction.py is not listed: its Urbanization_Rate level
+# is absorbed by the province effects, so the model cannot be estimated.
+
+SPECS = {
+    'twfe': {
+        'dependent': 'log_GRP',
+        'exog': ['Stringency_Index', 'Covid_Cases'],
+    },
+    'lagged_twfe': {
+        'dependent': 'log_GRP',
+        'exog': ['Stringency_Index', 'Stringency_Index_L1', 'Covid_Cases', 'Covid_Cases_L1'],
+        'lags': 1,
+        'edge': 'zero',
+    },
+    'twfe_urbanisation_interactionONLY': {
+        'dependent': 'log_GRP',
+        'exog': ['Stringency_Index', 'Stringency_x_Urban', 'Covid_Cases'],
+        'moderator': 'Urbanization_Rate',
+        'interact': ['Stringency_Index'],
+    },
+    'twfe_urbanisation_interactionONLY_lagged': {
+        'dependent': 'log_GRP',
+        'exog': ['Stringency_Index', 'Stringency_Index_L1', 'Stringency_x_Urban', 'Stringency_L1_x_Urban',
+                 'Covid_Cases', 'Covid_Cases_L1'],
+        'lags': 1,
+        'edge': 'zero',
+        'moderator': 'Urbanization_Rate',
+        'interact': ['Stringency_Index'],
+    },
+    'twfe_province_slopes': {
+        'dependent': 'log_GRP',
+        'exog': ['Covid_Cases'],
+        'slopes': ['Stringency_Index'],
+        # With a slope per province each province's score sums to zero on its
+        # own stringency column, so province clusters leave those slopes no
+        # variation to estimate a variance from.
+        'cov_type': 'robust',
+    },
+}
+
+SPEC_DEFAULTS = {
+    'sources': ['grp', 'stringency', 'cases'],
+    'lags': 0,
+    'lag_variables': ['Stringency_Index', 'Covid_Cases'],
+    'edge': 'zero',
+    'moderator': None,
+    'interact': [],
+    'slopes': [],
+    'cov_type': 'clustered',
+}
+
+
+def get_spec(spec):
+    """Full spec dict (defaults filled in) from a name in SPECS or a partial dict."""
+    if isinstance(spec, str):
+        if spec not in SPECS:
+            raise KeyError(f"Unknown spec '{spec}'; choose from {', '.join(SPECS)}.")
+        spec = SPECS[spec]
+    full = dict(SPEC_DEFAULTS)
+    full.update(spec)
+    return full
+
+
+def moderator_hash(spec):
+    """Content hash of the moderator table if the spec uses moderators ('' if not)."""
+    from lags import moderator_list
+    from panel_data import file_hash, moderators_path
+
+    if not moderator_list(get_spec(spec)['moderator']):
+        return ''
+    return file_hash(moderators_path())
+
+
+def build_frame(spec, panel=None):
+    """Estimation frame for `spec`: model variables, moderator and lags added.
+
+    `panel` is the merged long panel from panel_data.load_panel (loaded with
+    the spec's sources when not given).
+    """
+    from lags import add_lags, moderator_list
+    from panel_data import add_model_variables, add_moderators, load_panel
+
+    spec = get_spec(spec)
+    if panel is None:
+        panel = load_panel(sources=spec['sources'])
+    df = panel
+    moderators = moderator_list(spec['moderator'])
+    if moderators:
+        df = add_moderators(df, moderators).dropna(subset=moderators)
+    df = add_model_variables(df)
+    if spec['lags'] or moderators:
+        df = add_lags(df, spec['lag_variables'], lags=spec['lags'], edge=spec['edge'],
+                      moderator=spec['moderator'], interact=spec['interact'])
+    return df
@@ -0,0 +1,129 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from panel_data import CACHE_DIR, DATA_DIR, file_hash
+
+# --- Panel sheets straight from China_COVID_measures_cost.xlsx ---
+# The workbook is opened once in openpyxl's read-only (streaming) mode and each
+# needed sheet is iterated row by row exactly once. Rows go straight into
+# NumPy arrays (province ids plus a float matrix of quarters); there is no
+# per-cell pandas object. The parsed sheets are cached as .npz under
+# .panel_cache/, keyed on the workbook's sha256, so only the first run after
+# the workbook changes pays the parse cost.
+
+WORKBOOK = "China_COVID_measures_cost.xlsx"
+
+# source name (as in panel_data.PANEL_SOURCES) -> sheet name
+SHEETS = {
+    'grp': 'GRB (Real 2019 Billion RMB)',
+    'stringency': 'OxCGRT Stringency Index',
+    'cases': 'COVID-19 New Confirmed PC Cases',
+}
+# Sheets holding year-to-date cumulative values rather than quarterly flows.
+YTD_SHEETS = ('grp',)
+
+QUARTER_RE = re.compile(r'^20\d\dQ[1-4]$')
+
+
+def workbook_path(path=None):
+    return os.path.abspath(path) if path else os.path.join(DATA_DIR, WORKBOOK)
+
+
+class Sheet:
+    """One wide panel sheet as arrays: a row per province, a column per quarter."""
+
+    def __init__(self, gbprov, prov_ch, prov_en, quarters, values):
+        self.gbprov = gbprov
+        self.prov_ch = prov_ch
+        self.prov_en = prov_en
+        self.quarters = quarters
+        self.values = values
+
+    def to_long(self, value_name):
+        """Long layout (GbProv, ProvEN, Quarter, value_name) built by repeat/tile."""
+        n_prov, n_q = self.values.shape
+        return pd.DataFrame({
+            'GbProv': np.repeat(self.gbprov, n_q),
+            'ProvEN': np.repeat(self.prov_en, n_q),
+            'Quarter': np.tile(self.quarters, n_prov),
+            value_name: self.values.ravel(),
+        })
+
+
+def _parse_sheet(ws, ytd=False):
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows)
+    q_pos = [i for i, name in enumerate(header) if name is not None and QUARTER_RE.match(str(name).strip())]
+    first, last = q_pos[0], q_pos[-1] + 1
+    if q_pos != list(range(first, last)):
+        raise ValueError(f"Quarter columns of sheet '{ws.title}' are not contiguous.")
+
+    ids, ch, en, values = [], [], [], []
+    for row in rows:
+        if row[0] is None:
+            continue
+        ids.append(int(row[0]))
+        ch.append(row[1])
+        en.append(row[2])
+        values.append(row[first:last])
+    quarters = np.array([str(header[i]).strip() for i in q_pos])
+    values = np.array(values, dtype=np.float64)
+    if ytd:
+        values = _ytd_to_quarterly(values, quarters)
+    return Sheet(np.array(ids, dtype=np.int16), np.array(ch), np.array(en), quarters, values)
+
+
+def _ytd_to_quarterly(values, quarters):
+    # Q1 is already a flow; later quarters are the year-to-date difference.
+    out = values.copy()
+    for j in range(1, len(quarters)):
+        if quarters[j][:4] == quarters[j - 1][:4]:
+            out[:, j] = values[:, j] - values[:, j - 1]
+    return out
+
+
+def read_sheets(path=None, sources=tuple(SHEETS)):
+    """Parse the requested panel sheets in one streaming pass over the workbook."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ImportError("Reading the workbook directly requires openpyxl.") from e
+    wb = load_workbook(workbook_path(path), read_only=True, data_only=True)
+    try:
+        return {name: _parse_sheet(wb[SHEETS[name]], ytd=name in YTD_SHEETS) for name in sources}
+    finally:
+        wb.close()
+
+
+def _cache_file(key):
+    return os.path.join(CACHE_DIR, f"sheets-{key[:24]}.npz")
+
+
+def load_sheets(path=None, sources=tuple(SHEETS), use_cache=True):
+    """Panel sheets from the workbook, cached as .npz keyed on the workbook hash."""
+    sources = tuple(sources)
+    if not use_cache:
+        return read_sheets(path, sources)
+
+    cache_file = _cache_file(file_hash(workbook_path(path)))
+    cached = {}
+    if os.path.exists(cache_file):
+        with np.load(cache_file) as npz:
+            for name in sources:
+                if f"{name}.values" in npz:
+                    cached[name] = Sheet(*(npz[f"{name}.{field}"] for field in
+                                           ('gbprov', 'prov_ch', 'prov_en', 'quarters', 'values')))
+    missing = [name for name in sources if name not in cached]
+    if missing:
+        # Parse everything once so later calls for other sheets hit the cache too.
+        cached = read_sheets(path, tuple(SHEETS))
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        arrays = {f"{name}.{field}": getattr(sheet, field) for name, sheet in cached.items()
+                  for field in ('gbprov', 'prov_ch', 'prov_en', 'quarters', 'values')}
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_file, **arrays)
+        os.replace(tmp_file, cache_file)
+    return {name: cached[name] for name in sources}